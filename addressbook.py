@@ -24,7 +24,39 @@ import csv
 import os
 import re
 
+from operator import itemgetter
+from threading import Thread
+
 import libs
+from libs.fuzzy import NameIndex
+
+
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+class Contact(object):
+    """ The columns of an address book row that are used, normalized once
+        when the file is read """
+
+    __slots__ = ("fullname", "phone", "email", "twitter")
+
+    def __init__(self, fullname="", phone="", email="", twitter=""):
+        self.fullname = fullname
+        self.phone = _NON_DIGITS_RE.sub("", phone)
+        self.email = email.strip()
+        self.twitter = twitter.strip()
+
+
+class Contacts(object):
+    """ One read of the address book file, replaced as a whole on reload """
+
+    __slots__ = ("fields", "book", "index")
+
+    def __init__(self, fields=None, book=None, index=None):
+        self.fields = fields or []
+        self.book = book or {}
+        # An empty index is falsy, but still the one to keep
+        self.index = index if index is not None else NameIndex()
 
 
 class AddressBook(object):
@@ -37,32 +69,100 @@ class AddressBook(object):
         self.primary_email_field = "E-mail 1 - Value"
         self.twitter_field = "Custom Field 1 - Value"
         self.file = file
-        self.book = {}
+        self.stamp = None
+        self.contacts = Contacts()
         if not os.path.exists(file):
             raise Exception("Address book file not found")
-        data = open(file)
+        # Names are indexed off the startup path; exact names are found
+        # meanwhile, and fuzzy matches as they are indexed
+        self.reload(background=True)
+
+    @property
+    def fields(self):
+        return self.contacts.fields
+
+    @property
+    def book(self):
+        return self.contacts.book
+
+    @property
+    def index(self):
+        return self.contacts.index
+
+    def reload(self, background=False):
+        """ Reads the file again if it changed since it was last read
+            Returns the names added and the names removed """
+        stamp = self._get_stamp()
+        if stamp is None or stamp == self.stamp:
+            return [], []
+        fields, book = self._parse()
+        old = self.contacts
+        added = [name for name in book if name not in old.book]
+        removed = [name for name in old.book if name not in book]
+        # Readers get either the old contacts or the new ones, never a mix.
+        # The fuzzy index only depends on the names, so it is updated in
+        # place by the names that changed.
+        self.contacts = Contacts(fields, book, old.index)
+        self.stamp = stamp
+        if background:
+            thread = Thread(
+                target=old.index.update, args=(added, removed))
+            thread.daemon = True
+            thread.start()
+        else:
+            old.index.update(added, removed)
+        return added, removed
+
+    def _parse(self):
+        fields = []
+        book = {}
+        data = open(self.file)
         reader = csv.reader(data)
-        count = 0
         err = True
         while err:
             try:
                 for row in reader:
-                    if count == 0:
-                        self.fields = row
-                    nickname_field = self.fields.index(self.nickname_field)
-                    name = row[nickname_field].lower()
-                    if not name:
-                        fullname_field = self.fields.index(self.fullname_field)
-                        name = row[fullname_field].lower()
+                    if not fields:
+                        fields = row
+                        columns = self._get_columns(fields)
+                        get_values = itemgetter(*columns)
+                        continue
+                    try:
+                        values = get_values(row)
+                    except (IndexError, TypeError):
+                        # Short row, or a column missing from the file
+                        values = [
+                            row[i] if i is not None and i < len(row) else ""
+                            for i in columns]
+                    nickname, fullname = values[:2]
+                    name = (nickname or fullname).lower()
                     if not name:
                         continue
-                    self.book[name] = row
-                    count += 1
+                    book[name] = Contact(*values[1:])
             except Exception, what:
                 print what
                 err = True
                 continue
             err = False
+        data.close()
+        return fields, book
+
+    def _get_columns(self, fields):
+        """ Returns the indices of the columns Contact is made of, None for
+            a column missing from the file """
+        return [
+            fields.index(field) if field in fields else None
+            for field in (
+                self.nickname_field, self.fullname_field,
+                self.primary_phone_field, self.primary_email_field,
+                self.twitter_field)]
+
+    def _get_stamp(self):
+        try:
+            stat = os.stat(self.file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime, stat.st_size)
 
     def system(self, cmd):
         return libs.system(command=cmd, user=self.user)
@@ -73,36 +173,36 @@ class AddressBook(object):
     def exists(self, nickname):
         return self.book.get(nickname, None) is not None
 
+    def find(self, nickname):
+        """ Returns the nickname that best matches a possibly misheard one,
+            the confidence of the match and whether another nickname matched
+            about as well, or (None, 0.0, False) """
+        if not nickname:
+            return None, 0.0, False
+        nickname = nickname.lower()
+        if nickname in self.book:
+            return nickname, 1.0, False
+        return self.index.get_best(nickname)
+
     def get_row(self, nickname):
+        """ Returns the Contact of the nickname or None """
         return self.book.get(nickname, None)
 
     def get_fullname(self, nickname):
-        row = self.get_row(nickname)
-        if not row:
-            return None
-        return row[self.get_field_index(self.fullname_field)]
+        contact = self.get_row(nickname)
+        return contact.fullname if contact else None
 
     def get_primary_phone(self, nickname):
-        row = self.get_row(nickname)
-        if not row:
-            return None
-        raw_phone = row[self.get_field_index(self.primary_phone_field)]
-        number = re.sub("\D", "", raw_phone)
-        return number
+        contact = self.get_row(nickname)
+        return contact.phone if contact else None
 
     def get_primary_email(self, nickname):
-        row = self.get_row(nickname)
-        if not row:
-            return None
-        email = row[self.get_field_index(self.primary_email_field)]
-        return email
+        contact = self.get_row(nickname)
+        return contact.email if contact else None
 
     def get_twitter_username(self, nickname):
-        row = self.get_row(nickname)
-        if not row:
-            return None
-        username = row[self.get_field_index(self.twitter_field)]
-        return username
+        contact = self.get_row(nickname)
+        return contact.twitter if contact else None
 
 
 if __name__ == "__main__":
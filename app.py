@@ -29,27 +29,46 @@ import json
 import socket
 import subprocess
 import time
-import urllib
-import urllib2
 
+from collections import deque
 from config import config
+from connectivity import ConnectivityMonitor
 from gps import gps, WATCH_ENABLE
 from multiprocessing import Process, Queue
 from pydispatch import dispatcher
-from threading import Thread
+from threading import current_thread, Event, RLock, Thread
 
 from addressbook import AddressBook
 from core import CoreCommands
-from listener import Listener
-from models import connect_db, CommandNickname
-from speech2text import Speech2Text
+from decoder import (
+    create_decoder, HYPOTHESIS, READY, SAMPLE_RATE, SPEECH_END, SPEECH_START)
+from listener import CaptureStream, Listener, measure_volume
+from models import connect_db, corpus_store, nickname_cache
+from phrasecache import PhraseCache
+from prewarm import collect_names, collect_prompts, get_source_files, prewarm
+from scheduler import Scheduler
+from screen import ScreenClient
+from synthesizer import (
+    LocalSynthesizer, RemoteSynthesizer, SynthesisPolicy, split_blocks)
+from telemetry import LatencyTracker
+from vad import EnergyVad
 
 import libs
+from libs.lm import build_model, is_built
+from libs.prefetch import Prefetcher
+from libs.trie import WordTrie
 
 SPHINX_COMMAND = 0
 SPHINX_NAME = 1
 SPHINX_FREE_TEXT = 2
 
+# Posted to the message queue to wake up the main loop so it re-evaluates
+# its deadline. Never returned by get_one_message.
+WAKE_UP = "\x00wake_up"
+
+# Messages are (text, utterance_id) tuples. utterance_id is None for text
+# that was not heard, e.g. typed on the screen or sent over chat.
+
 message_queue = Queue()
 
 
@@ -78,11 +97,12 @@ class Application(object):
             self.default_path,
             config.get("system")["data_dir"])
 
-        self.inet_check_attempts = 0
         self.is_mic_down = False
         self.ready = False
         self.sleeping = False
         self.exit_now = False
+        self._unmuted = Event()
+        self._unmuted.set()
 
         self.nickname = config.get("computer_nickname")
         self.user_nickname = config.get("user_nickname")
@@ -90,62 +110,113 @@ class Application(object):
         self.my_email = config.get("email")
 
         self.screen_on = config.get("system")["screen"]
+        self.screen = ScreenClient(logger=self.logger)
         self.audio_in_device = str(config.get("audio")["in_device"])
 
         self.min_volume = config.get("audio")["min_volume"]
         self.sample_rate = config.get("audio")["sample_rate"]
         self.idle_duration = config.get("audio")["idle_duration"]
         self.take_order_duration = config.get("audio")["take_order_duration"]
-        self.flac_file = "/tmp/noise%d.flac"
-        self.vol_samples = 5
-        self.vol_total = 5
-        self.vol_average = 0.5
-        self.prev_idle_vol = 1.0
+        self.say_lookahead = config.get("audio")["say_lookahead"]
         self.sound_proc = None
 
         self.links = []
-        self.periodic_tasks = {}
+        host, port = config.get("system")["inet_check_address"].split(":")
+        self.connectivity = ConnectivityMonitor(
+            address=(host, int(port)),
+            interval_sec=config.get("system")["inet_check_interval_sec"],
+            down_after=config.get("system")["inet_check_max_attempts"],
+            logger=self.logger)
+        self.connectivity.start()
+        self.scheduler = Scheduler(
+            max_workers=config.get("system")["task_workers"],
+            logger=self.logger)
+        # Calls from other threads waiting to run on the main loop
+        self.main_calls = deque()
+        self.main_thread = None
+        self.speech_lock = RLock()
 
         connect_db()
+        corpus_store.import_file(os.path.join(
+            self.data_path, config.get("sphinx")["corpus_file"]))
 
         self.clean_files()
 
+        self.phrase_cache = PhraseCache(
+            cache_dir=os.path.join(
+                self.data_path, config.get("system")["tts_cache_dir"]),
+            pinned_dir=os.path.join(self.default_path, "sound"),
+            max_bytes=config.get("system")["tts_cache_mb"] * 1024 * 1024,
+            logger=self.logger)
+        self.phrase_cache.load()
+        self.synthesis = SynthesisPolicy(
+            phrase_cache=self.phrase_cache,
+            remote=RemoteSynthesizer(connectivity=self.connectivity),
+            local=LocalSynthesizer(
+                command=config.get("audio")["tts_local_command"]),
+            prefer=config.get("audio")["tts_engine"],
+            max_latency_sec=config.get("audio")["tts_max_latency_sec"],
+            logger=self.logger)
+
         self.addressbook = AddressBook(
             user=self.user,
             file=config.get("addressbook")["file"])
 
         self.listener = Listener(user=self.user, sample_rate=self.sample_rate)
-        self.speech2text = Speech2Text(
-            user=self.user,
-            sample_rate=self.sample_rate)
+        # Shared by the decoder, the mic check and anyone else listening
+        self.capture = CaptureStream(
+            hw=self.audio_in_device,
+            sample_rate=SAMPLE_RATE,
+            buffer_sec=config.get("audio")["capture_buffer_sec"],
+            logger=self.logger)
 
         # Voice command to event dispatch singnal table
         self.signals_at_sleep = []
         self.command2signal = {}
+        self.command_trie = WordTrie()
         self.core = CoreCommands(self)
         self.core.register_commands()
         self._import_plugins()
 
-        all_commands = ""
-        for key in self.command2signal.keys():
-            all_commands += self.nickname + " " + key + "\n"
-        all_commands += self.nickname + " stop\n"
-        all_commands += "yes\n"
-        all_commands += "no\n"
-        for name in self.addressbook.book.keys():
-            all_commands += name + "\n"
-        corpus_file = os.path.join(self.data_path, "keyword_corpus.txt")
-        with open(corpus_file, "w") as f:
-            f.write(all_commands)
+        self.write_keyword_corpus()
+        self.build_keyword_models()
 
         self.listener_thread = None
 
         self.sphinx_timeout = config.get("sphinx")["timeout_sec"]
         self.listening_since = None
-        self._sphinx = None
+        self.telemetry = LatencyTracker()
+        self.vad = EnergyVad(
+            sample_rate=SAMPLE_RATE,
+            speech_ratio=config.get("audio")["vad_speech_ratio"],
+            min_rms=self.min_volume,
+            hangover_sec=config.get("audio")["vad_hangover_sec"])
+        self.decoder = create_decoder(
+            backend=config.get("sphinx")["backend"],
+            capture=self.capture,
+            default_path=self.default_path,
+            ctlcount=config.get("sphinx")["ctlcount"],
+            hmm_dir=config.get("sphinx")["hmm_dir"],
+            vad=self.vad,
+            logger=self.logger)
         self.kill_sphinx()
+        self.decoder.preload([
+            self._get_sphinx_model(mode)
+            for mode in (SPHINX_COMMAND, SPHINX_NAME, SPHINX_FREE_TEXT)])
         self.sphinx_mode = SPHINX_COMMAND
 
+        stats_interval = config.get("system")["stats_interval_sec"]
+        if stats_interval > 0:
+            self.schedule_task(stats_interval, self.log_stats)
+
+        self.prewarm_stopped = Event()
+        self.prewarm_thread = None
+        self.prewarm_phrases()
+
+        reload_interval = config.get("addressbook")["reload_interval_sec"]
+        if reload_interval > 0:
+            self.schedule_task(reload_interval, self.reload_addressbook)
+
         if config.get("system")["have_gps"]:
             self.gps = gps(mode=WATCH_ENABLE)
         else:
@@ -153,17 +224,27 @@ class Application(object):
 
     @property
     def sphinx(self):
-        if self._sphinx is None or self._sphinx.poll() is not None:
+        if not self.decoder.is_alive():
             # Make sure mic is working and unmuted when starting sphinx
             vol = 0
             while vol < self.min_volume:
-                self.record_once()
-                vol = self._get_volume()
+                vol = self._get_volume(self.record_once())
                 self.logger.debug("Volume: %f" % vol)
                 time.sleep(1)
             self.restart_sphinx(self.sphinx_mode)
 
-        return self._sphinx
+        return self.decoder
+
+    @property
+    def on_mute(self):
+        return not self._unmuted.is_set()
+
+    @on_mute.setter
+    def on_mute(self, value):
+        if value:
+            self._unmuted.clear()
+        else:
+            self._unmuted.set()
 
     @property
     def audio_out_device(self):
@@ -186,59 +267,58 @@ class Application(object):
                     "Voice command %s already registered"
                     % command)
             self.command2signal[command] = signal
+            self.command_trie.add(command, signal)
             dispatcher.connect(func, signal=signal, sender=dispatcher.Any)
             self.logger.debug(
                 "Registered '%s' command with '%s' singnal"
                 % (command, signal))
 
-    def schedule_task(self, interval, func):
+    def schedule_task(self, interval, func, jitter=0.0):
+        """ Runs func every interval seconds on a worker thread. Anything
+            that speaks or listens goes through call_on_main. """
         self.logger.debug(
             "Scheduled %s with %d sec interval" %
             (func, interval))
-        tasks = self.periodic_tasks.setdefault(str(interval), [])
-        tasks.append(func)
+        return self.scheduler.add(interval, func, jitter=jitter)
+
+    def call_on_main(self, func, *args, **kwargs):
+        """ Runs func on the main loop, where speaking and reading the
+            message queue are safe. Runs it right away if already there. """
+        if self._is_main_thread():
+            return func(*args, **kwargs)
+        self.main_calls.append((func, args, kwargs))
+        self._wake_up_loop()
 
     def run(self, args=None):
+        self.main_thread = current_thread()
         if self.listener_thread is None or not self.listener_thread.is_alive():
             self.listener_thread = Thread(target=self._listen)
             self.listener_thread.start()
         self._loop()
 
     def execute_order(self, text):
-        nickname = CommandNickname().select().where(
-            CommandNickname.nickname == text)
-        if nickname and nickname.count():
-            text = nickname[0].command
+        text = nickname_cache.get(text) or text
 
-        for command in self.command2signal:
-            if not self.is_command(text, command):
-                continue
-            sig = self.command2signal[command]
-
-            if self.sleeping and sig not in self.signals_at_sleep:
-                return
-
-            if sig not in ["repeat command", "nickname command"]:
-                self.last_command = text
-            param = self._get_param(text, command)
-            self.logger.debug("Dispatching signal: %s" % sig)
-            kwargs = {"param": param}
-            dispatcher.send(signal=sig, **kwargs)
-            break
-        # else:
-        #     if not self.sleeping:
-        #         message = "Did you say, %s?" % text
-        #         self.say(message)
-
-    def is_command(self, text, command):
-        if text[0:len(command)] == command:
-            return True
-        return False
+        match = self.command_trie.longest_prefix(text)
+        if not match:
+            # if not self.sleeping:
+            #     message = "Did you say, %s?" % text
+            #     self.say(message)
+            return
+        command, sig, rest = match
+
+        if self.sleeping and sig not in self.signals_at_sleep:
+            return
+
+        if sig not in ["repeat command", "nickname command"]:
+            self.last_command = text
+        param = self._get_param(rest)
+        self.logger.debug("Dispatching signal: %s" % sig)
+        kwargs = {"param": param}
+        dispatcher.send(signal=sig, **kwargs)
 
     def clean_files(self):
         files = [
-            self.flac_file,
-            "/tmp/stt.txt",
             "/tmp/volume.txt"
         ]
         for file in files:
@@ -270,15 +350,16 @@ class Application(object):
         return True
 
     def recite(self, sentences, corpus=False):
-        self.sleeping = True
-        for sentence in sentences:
-            if not self.say(sentence):
-                self.logger.debug("Stopped reciting")
-                self.sleeping = False
-                return
+        with self.speech_lock:
+            self.sleeping = True
+            for sentence in sentences:
+                if not self.say(sentence):
+                    self.logger.debug("Stopped reciting")
+                    self.sleeping = False
+                    return
+            self.sleeping = False
         if corpus:  # Add to corpus all at once instead of sentence by sentence
-            self.app.add_corpus(" ".join(sentences))
-        self.sleeping = False
+            self.add_corpus(" ".join(sentences))
 
     def say(self, text, corpus=False, nowait=False, cache=False):
         try:
@@ -289,18 +370,28 @@ class Application(object):
 
         text = self._cut_link(text)
         text = text.replace("#", "")
-        words = text.split(" ")
-        index = 0
+        # Synthesize the next blocks while the current one is playing
+        speech = Prefetcher(
+            split_blocks(text),
+            lambda block: self._synthesize(block, cache=cache),
+            lookahead=self.say_lookahead)
         cont = True
-        while index < len(words):
-            block = " ".join(words[index:index + 10])
-            if block.strip():
-                self._say(block, nowait=nowait, cache=cache)
-            index += 10
-
-            if self.nickname + " stop" in self.get_one_message(wait=False):
-                cont = False
-                break
+        # Only the main loop may take commands off the queue
+        listen = self._is_main_thread()
+        try:
+            with self.speech_lock:
+                for file_name in speech:
+                    if not file_name:
+                        self.play_sound(
+                            "internet_is_down.mp3", nowait=nowait)
+                        break
+                    self.play_sound(file_name, nowait=nowait)
+                    if listen and self.nickname + " stop" in (
+                            self.get_one_message(wait=False)):
+                        cont = False
+                        break
+        finally:
+            speech.close()
 
         if corpus:
             self.add_corpus(text)
@@ -308,20 +399,35 @@ class Application(object):
         return cont
 
     def record_once(self, duration=1.0):
-        if os.path.exists(self.flac_file % 0):
-            os.remove(self.flac_file % 0)
-        self.listener.record_flac(
-            file=self.flac_file % 0,
-            hw=self.audio_in_device,
-            duration=duration)
+        """ Returns the next duration seconds of audio from the capture """
+        started = not self.capture.is_alive()
+        self.capture.start()
+        reader = self.capture.reader()
+        pcm = reader.read_seconds(duration, SAMPLE_RATE)
+        reader.close()
+        if started:
+            # Leave the mic as it was, e.g. for pocketsphinx_continuous
+            self.capture.stop()
+        return pcm
+
+    def post_message(self, text, utterance_id=None):
+        self.messages.put((text, utterance_id))
 
     def get_one_message(self, wait=True):
-        message = ""
+        message, utterance_id = "", None
         try:
-            message = self.messages.get(wait)
+            message, utterance_id = self.messages.get(wait)
+            # Wake ups are meant for the main loop only
+            while wait and message == WAKE_UP:
+                message, utterance_id = self.messages.get(wait)
         except Exception:
             pass
-        return message.lower().strip()
+        if message == WAKE_UP:
+            message = ""
+        message = message.lower().strip()
+        if message and utterance_id is not None:
+            self.telemetry.dispatched(utterance_id)
+        return message
 
     def clear_messages(self):
         self.on_mute = True
@@ -369,9 +475,15 @@ class Application(object):
         return None
 
     def record_nickname(self, nickname=None, say="Who?"):
+        accept = self.config.get("addressbook")["fuzzy_accept"]
+        ask = self.config.get("addressbook")["fuzzy_confirm"]
         for retry in range(0, 3):
-            if self.addressbook.exists(nickname):
-                return nickname
+            match, confidence, ambiguous = self.addressbook.find(nickname)
+            if match and confidence >= accept and not ambiguous:
+                return match
+            if (match and confidence >= ask and
+                    self.confirm("Did you mean %s?" % match)):
+                return match
             if nickname:
                 self.say("Sorry, I cannot find the contact", cache=True)
             nickname = self.record_content(
@@ -381,29 +493,102 @@ class Application(object):
         return None
 
 
+    def write_keyword_corpus(self):
+        """ Writes the command and name corpora from the live command table
+            and address book, and the keywords for the full model """
+        commands = [
+            self.nickname + " " + key
+            for key in sorted(self.command2signal.keys())]
+        commands += [self.nickname + " stop", "yes", "no"]
+        names = sorted(self.addressbook.book.keys())
+        sphinx = self.config.get("sphinx")
+        for key, lines in (
+                ("command_corpus_file", commands),
+                ("name_corpus_file", names),
+                ("keyword_corpus_file", commands + names)):
+            # Renamed into place, as the main loop may be reading the file
+            corpus_file = os.path.join(self.data_path, sphinx[key])
+            with open(corpus_file + ".tmp", "w") as f:
+                f.write("".join(line + "\n" for line in lines))
+            os.rename(corpus_file + ".tmp", corpus_file)
+
+    def build_keyword_models(self, modes=(SPHINX_COMMAND, SPHINX_NAME)):
+        """ Builds the command and name models from their corpora. Returns
+            the models that changed; unchanged corpora cost only a hash. """
+        sphinx = self.config.get("sphinx")
+        corpus_keys = {
+            SPHINX_COMMAND: "command_corpus_file",
+            SPHINX_NAME: "name_corpus_file"}
+        changed = []
+        for mode in modes:
+            lm_file, dict_file = self._get_sphinx_model(mode)
+            corpus_file = os.path.join(
+                self.data_path, sphinx[corpus_keys[mode]])
+            with open(corpus_file) as f:
+                if not any(line.strip() for line in f):
+                    # A model of nothing cannot be loaded; keep the last one
+                    self.logger.info(
+                        "Nothing to build %s from, keeping it" % lm_file)
+                    continue
+            try:
+                built = build_model(
+                    corpus_file, dict_file, lm_file,
+                    base_dict_file=sphinx["base_dict_file"],
+                    order=sphinx["lm_order"])
+            except Exception, e:
+                self.logger.error("Could not build %s: %s" % (lm_file, e))
+                continue
+            if built:
+                self.logger.info("Built %s" % lm_file)
+                changed.append((lm_file, dict_file))
+        return changed
+
+    def reload_addressbook(self):
+        """ Picks up changes to the address book file. The name vocabulary
+            is only regenerated when names were added or removed. """
+        added, removed = self.addressbook.reload()
+        if not (added or removed):
+            return
+        self.logger.info(
+            "Address book names changed, %d contacts"
+            % len(self.addressbook.book))
+        self.write_keyword_corpus()
+        self.decoder.reload(self.build_keyword_models(modes=(SPHINX_NAME,)))
+        if added:
+            self.prewarm_phrases(nicknames=added)
+
     def update_corpus(self):
         self.on_mute = True
-        self.kill_sphinx()
-        args = [
-            os.path.join(self.default_path, "bin/updatecorpus"),
-            self.default_path,
-            os.path.join(
-                self.data_path,
-                self.config.get("sphinx")["corpus_file"]),
-            os.path.join(
-                self.data_path,
-                self.config.get("sphinx")["keyword_corpus_file"]),
-            os.path.join(
-                self.data_path,
-                self.config.get("sphinx")["combined_corpus_file"]),
-            os.path.join(
-                self.data_path,
-                self.config.get("sphinx")["full_dict_file"]),
-            os.path.join(
-                self.data_path,
-                self.config.get("sphinx")["full_lm_file"])
-        ]
-        os.system(" ".join(args))
+        sphinx = self.config.get("sphinx")
+        combined_file = os.path.join(
+            self.data_path, sphinx["combined_corpus_file"])
+        keyword_file = os.path.join(
+            self.data_path, sphinx["keyword_corpus_file"])
+        with open(combined_file, "w") as f:
+            with open(keyword_file) as keywords:
+                f.writelines(keywords)
+            corpus_store.write(f)
+        lm_file, dict_file = self._get_sphinx_model(SPHINX_FREE_TEXT)
+        if is_built(
+                combined_file, dict_file, lm_file,
+                base_dict_file=sphinx["base_dict_file"],
+                order=sphinx["lm_order"]):
+            self.logger.info("Skipped the unchanged full model")
+        else:
+            # Built in its own process, as forking this one with its threads
+            # running for a process pool could deadlock
+            start = time.time()
+            subprocess.call([
+                "sh",
+                os.path.join(self.default_path, "bin/updatecorpus"),
+                self.default_path,
+                combined_file, dict_file, lm_file,
+                "--base-dict=" + sphinx["base_dict_file"],
+                "--order=%d" % sphinx["lm_order"],
+                "--workers=%d" % sphinx["lm_workers"]])
+            self.logger.info(
+                "Built the full model in %.1f sec" % (time.time() - start))
+            self.decoder.reload([(lm_file, dict_file)])
         self.on_mute = False
         self.say("Updated vocabulary", cache=True)
 
@@ -412,22 +597,26 @@ class Application(object):
         self.logger.debug("Adding corpus: " + text)
         if not text:
             return
-        text = re.sub(r"[^\w]", " ", text).strip()
-        corpus_file = os.path.join(
-            self.data_path,
-            self.config.get("sphinx")["corpus_file"])
-        with open(corpus_file, "a") as f:
-            f.write(text + "\n")
+        text = " ".join(re.sub(r"[^\w]", " ", text).split())
+        if text:
+            corpus_store.add(text.lower())
 
     def pop_link(self):
         return self.links.pop() if self.links else None
 
-    def mute(self):
+    def mute(self, release_audio=False):
+        """ Stops listening. The decoder stays loaded, and the mic is
+            only released to others if release_audio is True """
         self.on_mute = True
-        self.kill_sphinx()
+        if release_audio:
+            self.kill_sphinx()
+            self.capture.stop()
+        else:
+            self.decoder.suspend()
 
     def unmute(self):
         self.on_mute = False
+        self.decoder.resume()
 
     def wake_up(self):
         self.say("Hello again", cache=True)
@@ -448,47 +637,113 @@ class Application(object):
     def system(self, cmd):
         return libs.system(user=self.user, command=cmd)
 
+    def get_stats(self):
+        return {
+            "latency": self.telemetry.get_histograms(),
+            "decoder": self.decoder.get_stats(),
+            "vad": self.vad.get_stats(),
+            "phrase_cache": self.phrase_cache.get_stats(),
+            "connectivity": self.connectivity.get_stats(),
+            "synthesis": self.synthesis.get_stats(),
+            "tasks": self.scheduler.get_stats()
+        }
+
+    def log_stats(self):
+        for line in self.telemetry.format_histograms():
+            self.logger.info(line)
+        self.logger.info("Decoder stats: %s" % self.decoder.get_stats())
+        self.logger.info("VAD stats: %s" % self.vad.get_stats())
+        self.logger.info(
+            "Phrase cache stats: %s" % self.phrase_cache.get_stats())
+
     def _loop(self):
         while not self.exit_now:
-            if self.ready and not self.sleeping:
-                self._execute_periodic_tasks()
+            self.scheduler.run_pending(
+                execute=self.ready and not self.sleeping)
+            self._run_main_calls()
             if (self.listening_since and
-                    time.time() - self.listening_since >
+                    time.time() - self.listening_since >=
                     self.sphinx_timeout):
                 self.logger.debug("Sphinx timeout")
                 self.listening_since = None
-                self.kill_sphinx()
+                self.decoder.reset()
                 if not self.sleeping:
                     self.play_sound("sys_sphinx_timeout.wav", nowait=True)
                 css = {"background-color": "red"}
                 self.update_screen(css=css)
                 continue
 
-            message = self.get_one_message(wait=False)
+            message, utterance_id = self._wait_for_message(
+                self._get_loop_timeout())
             if not message:
                 continue
             head = message.find(self.nickname)
             if head == -1:
                 continue
             self.logger.info("%s: %s" % (self.user_nickname, message))
+            if utterance_id is not None:
+                self.telemetry.dispatched(utterance_id)
             message = message[head + len(self.nickname):].strip()
             if message:
                 self.execute_order(message)
+        self.scheduler.shutdown()
+        self.prewarm_stopped.set()
+        self.connectivity.stop()
+        # Release the listener if it is waiting to be unmuted
+        self._unmuted.set()
         self.listener_thread.join(1.0)
         if self.listener_thread.is_alive():
             self.listener_thread._Thread__stop()
         self.kill_sphinx()
+        self.capture.stop()
         return
 
-    def _get_volume(self, rotation=0):
-        vol = self.listener.get_volume(file=self.flac_file, rotation=rotation)
+    def _is_main_thread(self):
+        return current_thread() is self.main_thread
+
+    def _run_main_calls(self):
+        while self.main_calls:
+            func, args, kwargs = self.main_calls.popleft()
+            try:
+                func(*args, **kwargs)
+            except Exception, e:
+                self.logger.exception(e)
+
+    def _get_loop_timeout(self):
+        """ Seconds the main loop may block before it has work to do """
+        deadlines = []
+        if self.listening_since:
+            deadlines.append(self.listening_since + self.sphinx_timeout)
+        task_timeout = self.scheduler.get_timeout()
+        if task_timeout is not None:
+            deadlines.append(time.time() + task_timeout)
+        if not deadlines:
+            return None
+        return max(0, min(deadlines) - time.time())
+
+    def _wait_for_message(self, timeout=None):
+        """ Blocks until a message, a wake up or the timeout. Returns
+            (text, utterance_id) """
+        try:
+            message, utterance_id = self.messages.get(True, timeout)
+        except Exception:
+            return "", None
+        if message == WAKE_UP:
+            return "", None
+        return message.lower().strip(), utterance_id
+
+    def _wake_up_loop(self):
+        self.post_message(WAKE_UP)
+
+    def _get_volume(self, pcm):
+        vol = measure_volume(pcm)["peak"] if len(pcm) else -1.0
         if vol < 0:
             if not self.is_mic_down:
-                self.say("Microphone is busy or down")
+                self.call_on_main(self.say, "Microphone is busy or down")
                 self.is_mic_down = True
             return 0.0
         if self.is_mic_down:
-            self.say("Microphone is up")
+            self.call_on_main(self.say, "Microphone is up")
             self.is_mic_down = False
         return vol
 
@@ -498,122 +753,85 @@ class Application(object):
             mode = 0
         self.logger.debug("Restarting sphinx")
         self.sphinx_mode = mode
-        if mode == 0:
-            lm_file = self.config.get("sphinx")["command_lm_file"]
-            dict_file = self.config.get("sphinx")["command_dict_file"]
-        elif mode == 1:
+        self.decoder.start(*self._get_sphinx_model(mode))
+        self.logger.debug("Decoder stats: %s" % self.decoder.get_stats())
+        self.unmute()
+
+    def _get_sphinx_model(self, mode):
+        if mode == SPHINX_NAME:
             lm_file = self.config.get("sphinx")["name_lm_file"]
             dict_file = self.config.get("sphinx")["name_dict_file"]
-        elif mode == 2:
+        elif mode == SPHINX_FREE_TEXT:
             lm_file = self.config.get("sphinx")["full_lm_file"]
             dict_file = self.config.get("sphinx")["full_dict_file"]
-
-        args = (
-            "pocketsphinx_continuous",
-            "-lm",
-            os.path.join(
-                self.data_path,
-                lm_file),
-            "-dict",
-            os.path.join(
-                self.data_path,
-                dict_file),
-            "-ctlcount",
-            "%d" % self.config.get("sphinx")["ctlcount"],
-        )
-        self._sphinx = subprocess.Popen(
-            " ".join(args),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            shell=True)
-        self.unmute()
+        else:
+            lm_file = self.config.get("sphinx")["command_lm_file"]
+            dict_file = self.config.get("sphinx")["command_dict_file"]
+        return (
+            os.path.join(self.data_path, lm_file),
+            os.path.join(self.data_path, dict_file))
 
     def _import_plugins(self):
+        for plugin in self._get_plugins():
+            module = libs.dynamic_import("plugins." + plugin)
+            module.register(self)
+
+    def _get_plugins(self):
+        """ Names of the plugin packages, leaving out those turned off in
+            the config so their code and dependencies are never imported """
         path, file = os.path.split(os.path.realpath(__file__))
         path = os.path.join(path, "plugins")
-        for plugin in os.listdir(path):
+        plugins = []
+        for plugin in sorted(os.listdir(path)):
             if plugin == "__init__.py":
                 continue
-            if (plugin != "__init__.py" and
-                    os.path.isdir(os.path.join(path, plugin)) and
+            if not (os.path.isdir(os.path.join(path, plugin)) and
                     os.path.exists(os.path.join(path, plugin, "__init__.py"))):
-                module = libs.dynamic_import("plugins." + plugin)
-                module.register(self)
-
-    def _execute_periodic_tasks(self):
-        current_time = int(time.time())
-        for interval in self.periodic_tasks.keys():
-            if current_time % int(interval) > 0:
                 continue
-            for task in self.periodic_tasks[interval]:
-                try:
-                    task()
-                except Exception, e:
-                    self.logger.exception(e)
-
-    def _get_param(self, text, command):
-        text = text[len(command):]
+            section = self.config.get(plugin)
+            if (section is not None and "active" in section and
+                    not section.as_bool("active")):
+                self.logger.debug("Skipped inactive plugin %s" % plugin)
+                continue
+            plugins.append(plugin)
+        return plugins
+
+    def _get_param(self, text):
         endpos = text.find(self.config.get("audio")["param_terminator"])
         if endpos > -1:
             text = text[:endpos]
         return text.strip()
 
-    def _is_inet_up(self):
-        try:
-            # Ping Google IP
-            response=urllib2.urlopen('http://74.125.228.100',timeout=1)
-            return True
-        except urllib2.URLError as err: pass
-        return False
-
-    def _say(self, text, nowait, cache=False):
-        file_name = text.lower().strip().replace(" ", "_")
-        file_name = file_name.replace("?", "")
-        file_name = file_name.replace(",", "").replace(".", "")
-        file_name += ".mp3"
-        if self.play_sound(file_name, nowait=nowait):
+    def prewarm_phrases(self, nicknames=None):
+        """ Fills the phrase cache in the background with the prompts and
+            all names, or only with the names of the nicknames given """
+        workers = self.config.get("audio")["tts_prewarm_workers"]
+        if workers <= 0:
             return
-
-        if not self._is_inet_up():
-            self.say("Internet is down", cache=True)
+        if self.prewarm_thread is not None and self.prewarm_thread.is_alive():
+            self.logger.debug("Prewarm already running, skipped")
             return
-
-        try:
-            param = urllib.urlencode({"tl": "en", "q": text})
-        except UnicodeEncodeError:
-            return
-        url = "http://translate.google.com/translate_tts?" + param
-
-        if not cache:
-            return self.play_sound(url=url, nowait=nowait)
-
-        file_name = self.default_path + "/sound/" + file_name
-        self._download(url, file_name)
-        self.play_sound(file_name)
-
-    def _download(self, url, file_name):
-        user_agent = "Mozilla/4.0 (compatible; MSIE 5.5; Windows NT)"
-        headers = {"User-Agent": user_agent}
-        req = urllib2.Request(url=url, headers=headers)
-        client = urllib2.urlopen(req)
-        f = open(file_name, "wb")
-        meta = client.info()
-        file_size = int(meta.getheaders("Content-Length")[0])
-        print "Downloading: %s Bytes: %s" % (file_name, file_size)
-
-        file_size_dl = 0
-        block_sz = 8192
-        while True:
-            buffer = client.read(block_sz)
-            if not buffer:
-                break
-
-            file_size_dl += len(buffer)
-            f.write(buffer)
-            status = r"%10d  [%3.2f%%]" % (file_size_dl, file_size_dl * 100. / file_size)
-            status = status + chr(8)*(len(status)+1)
-            print status,
-        f.close()
+        self.prewarm_thread = Thread(
+            target=self._prewarm_phrases, args=(workers, nicknames))
+        self.prewarm_thread.daemon = True
+        self.prewarm_thread.start()
+
+    def _prewarm_phrases(self, workers, nicknames=None):
+        if nicknames is None:
+            path, file = os.path.split(os.path.realpath(__file__))
+            phrases = collect_prompts(get_source_files(path))
+        else:
+            phrases = set()
+        phrases |= collect_names(self.addressbook, nicknames)
+        counts = prewarm(
+            self.synthesis, phrases, workers=workers,
+            stopped=self.prewarm_stopped)
+        self.logger.info("Prewarmed phrase cache: %s" % counts)
+
+    def _synthesize(self, text, cache=False):
+        """ Returns the file to play for the text or None if no engine can
+            synthesize it """
+        return self.synthesis.synthesize(text, cache=cache)
 
     def _remove_link(self, text):
         return self._cut_link(text, remember=False)
@@ -635,60 +853,56 @@ class Application(object):
         self.on_mute = False
         while not self.exit_now:
             if self.on_mute:
+                self._unmuted.wait()
                 continue
-            output = self.sphinx.stdout.readline()
-            # self.logger.debug(output)
-            if "READY" in output:
-                if not self.ready:
-                    self.say("Voice command ready.")
-                    self.ready = True
-                css = {"background-color": "green"}
-                self.update_screen(css=css)
-            elif "Listening..." in output:
-                self.logger.debug(
-                    "Started to listen at %s" % datetime.datetime.now())
-                css = {"background-color": "blue"}
-                self.update_screen(css=css)
-                self.listening_since = time.time()
-            elif "Stopped listening" in output:
-                self.logger.debug("Stopped listening. Please wait")
-                css = {"background-color": "yellow"}
-                self.update_screen(css=css)
-            m = re.search(r"\d{9}: .*", output)
-            if m:
-                message = m.group(0)[11:]
-                message = re.sub(r"[^\w]", " ", message)
-                duration = 0
-                if self.listening_since:
-                    duration = time.time() - self.listening_since
-                self.logger.debug("Listened for %d seconds" % int(duration))
-                self.listening_since = None
-                self.logger.debug(message)
-                if not self.on_mute:
-                    self.messages.put(message)
+            decoder = self.sphinx
+            event = decoder.read_event()
+            while event is not None and not self.exit_now:
+                self._handle_sphinx_event(event)
+                event = decoder.read_event()
+
+    def _handle_sphinx_event(self, event):
+        self.telemetry.add_event(event)
+        if event.kind == READY:
+            if not self.ready:
+                # On the listener thread, which must go on reading events
+                self.call_on_main(self.say, "Voice command ready.")
+                self.ready = True
+            css = {"background-color": "green"}
+            self.update_screen(css=css)
+            self.listening_since = None
+        elif event.kind == SPEECH_START:
+            self.logger.debug(
+                "Started to listen at %s" % datetime.datetime.now())
+            css = {"background-color": "blue"}
+            self.update_screen(css=css)
+            self.listening_since = time.time()
+            self._wake_up_loop()
+        elif event.kind == SPEECH_END:
+            self.logger.debug("Stopped listening. Please wait")
+            css = {"background-color": "yellow"}
+            self.update_screen(css=css)
+        elif event.kind == HYPOTHESIS:
+            message = re.sub(r"[^\w]", " ", event.text)
+            duration = 0
+            if self.listening_since:
+                duration = time.time() - self.listening_since
+            self.logger.debug("Listened for %d seconds" % int(duration))
+            self.listening_since = None
+            self.logger.debug(message)
+            if not self.on_mute:
+                self.telemetry.expect_dispatch(event.utterance_id)
+                self.post_message(message, event.utterance_id)
 
     def kill_sphinx(self):
-        os.system(self.default_path + "/bin/killps")
-        if self._sphinx:
-            self._sphinx = None
+        self.decoder.stop()
         self.logger.debug("Terminated Sphinx")
 
     # Requires Flask server
     def update_screen(self, html=None, css={"background-color": "white"}):
         if not self.screen_on:
             return
-        url = "http://0.0.0.0:8000/update/"
-        user_agent = "Mozilla/4.0 (compatible; MSIE 5.5; Windows NT)"
-        values = {"html": html, "css": css}
-        headers = {"User-Agent": user_agent}
-        data = urllib.urlencode(values)
-        req = urllib2.Request(url, data, headers)
-        try:
-            response = urllib2.urlopen(req)
-        except urllib2.HTTPError, err:
-            self.logger.info(err)
-            return
-        response.read()
+        self.screen.update(html=html, css=css)
 
     # Requires GPS
     def get_lat_long(self):
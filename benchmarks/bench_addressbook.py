@@ -0,0 +1,132 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures load time and resident memory of a large Google contacts export,
+kept as full CSV rows as before and as projected Contact records, with and
+without the fuzzy nickname index. Each load runs in its own process.
+
+Usage: python benchmarks/bench_addressbook.py [rows] [columns]
+"""
+
+import csv
+import os
+import random
+import sys
+import time
+
+from multiprocessing import Pipe, Process
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from addressbook import AddressBook  # NOQA
+
+CSV_FILE = "/tmp/bench_addressbook.csv"
+FIELDS = [
+    "Name", "Nickname", "Phone 1 - Value", "E-mail 1 - Value",
+    "Custom Field 1 - Value"]
+
+
+def write_csv(rows, columns, rng):
+    header = FIELDS + ["Extra %d" % i for i in range(columns - len(FIELDS))]
+    with open(CSV_FILE, "wb") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            writer.writerow([
+                "Contact %d" % i,
+                "nick %d" % i,
+                "+1 (604) 555-%04d" % rng.randint(0, 9999),
+                "contact%d@example.com" % i,
+                "@contact%d" % i] +
+                ["value %d" % rng.randint(0, 999) if rng.random() < 0.3
+                 else "" for j in range(len(header) - len(FIELDS))])
+
+
+def get_rss():
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def load_rows():
+    """ The storage as it was, every row of every column """
+    book = {}
+    fields = None
+    with open(CSV_FILE) as f:
+        for row in csv.reader(f):
+            if fields is None:
+                fields = row
+                continue
+            name = row[fields.index("Nickname")].lower()
+            book[name] = row
+    return book
+
+
+def load_contacts():
+    addressbook = AddressBook.__new__(AddressBook)
+    addressbook.nickname_field = "Nickname"
+    addressbook.fullname_field = "Name"
+    addressbook.primary_phone_field = "Phone 1 - Value"
+    addressbook.primary_email_field = "E-mail 1 - Value"
+    addressbook.twitter_field = "Custom Field 1 - Value"
+    addressbook.file = CSV_FILE
+    return addressbook._parse()
+
+
+def load_addressbook():
+    return AddressBook(user=None, file=CSV_FILE)
+
+
+def measure(load, conn):
+    before = get_rss()
+    start = time.time()
+    result = load()
+    elapsed = time.time() - start
+    conn.send((elapsed, get_rss() - before))
+    del result
+
+
+def run(name, load):
+    parent, child = Pipe()
+    process = Process(target=measure, args=(load, child))
+    process.start()
+    elapsed, rss = parent.recv()
+    process.join()
+    print "%-20s load: %6.2f s  rss: %7.1f MB" % (
+        name, elapsed, rss / 1024.0 / 1024.0)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    write_csv(rows, columns, random.Random(0))
+    print "%d rows, %d columns, %.1f MB of CSV" % (
+        rows, columns, os.path.getsize(CSV_FILE) / 1024.0 / 1024.0)
+    run("full rows", load_rows)
+    run("contacts", load_contacts)
+    run("contacts and index", load_addressbook)
+    os.remove(CSV_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Compares the old linear prefix scan over command2signal with the word trie
+used by Application.execute_order.
+
+Usage: python benchmarks/bench_command_match.py [commands] [utterances]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from libs.trie import WordTrie  # NOQA
+
+WORDS = (
+    "send an sms text message to read tell me search what is who where "
+    "turn on off switch the last command repeat nickname status report "
+    "go to sleep wake up call email tweet play next previous page").split()
+
+
+def make_commands(count):
+    random.seed(0)
+    commands = set()
+    while len(commands) < count:
+        length = random.randint(1, 5)
+        commands.add(" ".join(random.choice(WORDS) for i in range(length)))
+    return list(commands)
+
+
+def linear_match(command2signal, text):
+    """ What execute_order did before the trie, first prefix wins """
+    for command in command2signal:
+        if text[0:len(command)] == command:
+            return command, command2signal[command], text[len(command):]
+    return None
+
+
+def run(name, func, utterances):
+    start = time.time()
+    for text in utterances:
+        func(text)
+    elapsed = time.time() - start
+    print "%-8s %8.2f us/match" % (name, elapsed / len(utterances) * 1e6)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    commands = make_commands(count)
+    command2signal = dict((command, command) for command in commands)
+    trie = WordTrie()
+    for command in commands:
+        trie.add(command, command)
+
+    utterances = []
+    for i in range(samples):
+        text = random.choice(commands) + " " + random.choice(WORDS)
+        if i % 4 == 0:
+            text = "unknown " + text
+        utterances.append(text)
+
+    print "%d commands, %d utterances" % (len(commands), len(utterances))
+    run("linear", lambda text: linear_match(command2signal, text), utterances)
+    run("trie", trie.longest_prefix, utterances)
+
+
+if __name__ == "__main__":
+    main()
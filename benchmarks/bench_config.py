@@ -0,0 +1,90 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures the part of Application startup that loads the config and the
+plugins: importing config, which builds the plugin config spec either by
+importing every plugin or from the cached manifest, and then importing the
+plugins Application._import_plugins would register. Each run is a new
+process, as at startup. Turn plugins off with "active = False" in their
+section of config.ini to see what is saved by not importing them.
+
+Usage: python benchmarks/bench_config.py [runs]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MANIFEST = os.path.join(ROOT, "plugins", ".configspec.json")
+# Prints how many plugins are active and how many plugin modules were
+# loaded, after the work of startup up to registering the plugins
+CHILD = """
+import logging
+import sys
+import config
+import libs
+from app import Application
+app = Application.__new__(Application)
+app.config = config.config
+app.logger = logging.getLogger()
+plugins = app._get_plugins()
+for plugin in plugins:
+    libs.dynamic_import("plugins." + plugin)
+print len(plugins), len([
+    name for name in sys.modules
+    if name.startswith("plugins.") and sys.modules[name]])
+"""
+
+
+def start_up():
+    start = time.time()
+    output = subprocess.check_output([sys.executable, "-c", CHILD], cwd=ROOT)
+    plugins, modules = output.split()[-2:]
+    return time.time() - start, int(plugins), int(modules)
+
+
+def run(name, runs, cached):
+    times = []
+    for i in range(runs):
+        if not cached and os.path.exists(MANIFEST):
+            os.remove(MANIFEST)
+        elapsed, plugins, modules = start_up()
+        times.append(elapsed)
+    times.sort()
+    print (
+        "%-8s %8.1f ms median %8.1f ms min, %d active plugins, "
+        "%d plugin modules" % (
+            name, times[len(times) / 2] * 1000, times[0] * 1000, plugins,
+            modules))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    run("import", runs, cached=False)
+    run("manifest", runs, cached=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures idle CPU usage of Application._loop and the latency from putting
+a message on the queue to execute_order being called.
+
+Usage: python benchmarks/bench_main_loop.py [idle_seconds] [samples]
+"""
+
+import logging
+import os
+import resource
+import sys
+import time
+
+from collections import deque
+from threading import Event, Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import Application, message_queue  # NOQA
+from connectivity import ConnectivityMonitor  # NOQA
+from listener import CaptureStream  # NOQA
+from scheduler import Scheduler  # NOQA
+from telemetry import LatencyTracker  # NOQA
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def busy_loop(app):
+    """ The loop as it was before it blocked on the queue """
+    while not app.exit_now:
+        message = app.get_one_message(wait=False)
+        if not message:
+            continue
+        head = message.find(app.nickname)
+        if head == -1:
+            continue
+        app.execute_order(message[head + len(app.nickname):].strip())
+
+
+def create_app():
+    app = Application.__new__(Application)
+    app.logger = logging.getLogger(__name__)
+    app.messages = message_queue
+    app.nickname = "computer"
+    app.user_nickname = "master"
+    app.exit_now = False
+    app.ready = True
+    app.sleeping = False
+    app.listening_since = None
+    app.sphinx_timeout = 30
+    app.scheduler = Scheduler()
+    app.telemetry = LatencyTracker()
+    app._unmuted = Event()
+    app._unmuted.set()
+    app.listener_thread = Thread(target=lambda: None)
+    app.listener_thread.start()
+    app.kill_sphinx = lambda: None
+    app.capture = CaptureStream(hw="null")
+    app.connectivity = ConnectivityMonitor()
+    app.prewarm_stopped = Event()
+    app.main_calls = deque()
+    app.main_thread = None
+    return app
+
+
+def measure(loop, idle_seconds, samples):
+    app = create_app()
+    dispatched = []
+    done = Event()
+
+    def execute_order(text):
+        dispatched.append(time.time())
+        done.set()
+
+    app.execute_order = execute_order
+    thread = Thread(target=loop, args=(app,))
+    thread.start()
+
+    start = cpu_time()
+    time.sleep(idle_seconds)
+    idle_cpu = (cpu_time() - start) / idle_seconds
+
+    latencies = []
+    for i in range(samples):
+        done.clear()
+        sent = time.time()
+        app.post_message("computer order %d" % i)
+        done.wait(5.0)
+        latencies.append(dispatched[-1] - sent)
+        time.sleep(0.01)
+
+    app.exit_now = True
+    app._wake_up_loop()
+    thread.join()
+    latencies.sort()
+    return idle_cpu, latencies
+
+
+def main():
+    idle_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    loops = (
+        ("busy poll", busy_loop),
+        ("blocking", lambda app: app._loop()))
+    for name, loop in loops:
+        idle_cpu, latencies = measure(loop, idle_seconds, samples)
+        print "%-10s idle cpu: %5.1f%%  latency p50: %.3f ms  p99: %.3f ms" % (
+            name,
+            idle_cpu * 100,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000)
+
+
+if __name__ == "__main__":
+    main()
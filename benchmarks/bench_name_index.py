@@ -0,0 +1,111 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures building the nickname index of a synthetic address book and
+looking up exact, misspelled and sound-alike nicknames in it, against a
+scan comparing the nickname to every contact.
+
+Usage: python benchmarks/bench_name_index.py [contacts] [lookups]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from libs.fuzzy import levenshtein_from, NameIndex  # NOQA
+
+FIRST = [
+    "john", "jane", "michael", "catherine", "stephen", "philip", "sarah",
+    "thomas", "david", "maria", "peter", "laura", "james", "anna", "robert",
+    "linda", "daniel", "susan", "mark", "karen", "paul", "nancy", "george",
+    "emily", "kevin", "jessica", "brian", "amanda", "edward", "helen"]
+LAST = [
+    "smith", "johnson", "brown", "taylor", "miller", "wilson", "moore",
+    "thompson", "white", "harris", "martin", "garcia", "clark", "lewis",
+    "walker", "young", "wright", "knight", "schmidt", "tanaka", "nguyen",
+    "kowalski", "murphy", "oconnor", "fischer", "rossi", "silva", "kim"]
+
+
+def make_names(count, rng):
+    names = set()
+    while len(names) < count:
+        names.add("%s %s%s" % (
+            rng.choice(FIRST), rng.choice(LAST),
+            rng.choice(["", "", str(rng.randint(1, 999))])))
+    return sorted(names)
+
+
+def misspell(name, rng):
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice("aeioustrn") + name[i + 1:]
+
+
+def scan(names, phrase):
+    """ Compares the phrase to every name, as a plain dict would have to """
+    distance = levenshtein_from(phrase)
+    return min((distance(name), name) for name in names)
+
+
+def run(name, func, phrases):
+    start = time.time()
+    for phrase in phrases:
+        func(phrase)
+    elapsed = time.time() - start
+    print "%-22s %9.3f ms/lookup" % (name, elapsed / len(phrases) * 1000)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(0)
+    names = make_names(count, rng)
+
+    start = time.time()
+    index = NameIndex(names)
+    print "built index of %d names in %.2f s" % (
+        len(index), time.time() - start)
+
+    sample = [rng.choice(names) for i in range(lookups)]
+    misspelled = [misspell(name, rng) for name in sample]
+    sound_alike = [
+        name.replace("stephen", "steven").replace("catherine", "kathryn")
+        .replace("philip", "filip").replace("john", "jon")
+        for name in sample]
+    hits = sum(
+        1 for name, phrase in zip(sample, misspelled)
+        if index.get_best(phrase)[0] == name)
+
+    run("index exact", index.get_best, sample)
+    run("index misspelled", index.get_best, misspelled)
+    run("index sound-alike", index.get_best, sound_alike)
+    run("scan misspelled", lambda phrase: scan(names, phrase),
+        misspelled[:max(1, lookups // 20)])
+    print "misspelled resolved to the intended name: %d of %d" % (
+        hits, lookups)
+
+
+if __name__ == "__main__":
+    main()
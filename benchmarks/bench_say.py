@@ -0,0 +1,114 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures the silence between the blocks of a long Application.say with a
+fake speech source and a fake player, synthesizing each block before
+playing it and while the previous block plays.
+
+Usage: python benchmarks/bench_say.py [synth_seconds] [play_seconds]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from threading import current_thread, RLock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import Application, message_queue  # NOQA
+from telemetry import LatencyTracker  # NOQA
+
+# Long enough for six blocks of ten words
+TEXT = " ".join("word%d" % i for i in range(60))
+
+
+def sequential_say(app, text):
+    """ The say loop as it was before synthesis was pipelined """
+    words = text.split(" ")
+    index = 0
+    while index < len(words):
+        block = " ".join(words[index:index + 10])
+        app.play_sound(app._synthesize(block))
+        index += 10
+
+
+def create_app(synth_seconds, play_seconds, lookahead):
+    app = Application.__new__(Application)
+    app.logger = logging.getLogger(__name__)
+    app.messages = message_queue
+    app.nickname = "computer"
+    app.screen_on = False
+    app.links = []
+    app.say_lookahead = lookahead
+    app.telemetry = LatencyTracker()
+    app.played = []
+    app.main_thread = current_thread()
+    app.speech_lock = RLock()
+
+    def synthesize(text, cache=False):
+        time.sleep(synth_seconds)
+        return text
+
+    def play_sound(file_name="", url="", nowait=False):
+        start = time.time()
+        time.sleep(play_seconds)
+        app.played.append((start, time.time()))
+        return True
+
+    app._synthesize = synthesize
+    app.play_sound = play_sound
+    return app
+
+
+def get_gaps(played):
+    return [
+        start - prev_end
+        for (_, prev_end), (start, _) in zip(played, played[1:])]
+
+
+def main():
+    synth_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    play_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    runs = [("sequential", 1, sequential_say)]
+    for lookahead in (1, 2):
+        runs.append(("lookahead %d" % lookahead, lookahead,
+                     lambda app, text: app.say(text)))
+    for name, lookahead, say in runs:
+        app = create_app(synth_seconds, play_seconds, lookahead)
+        start = time.time()
+        say(app, TEXT)
+        elapsed = time.time() - start
+        gaps = get_gaps(app.played)
+        print "%-12s total: %5.2f s  first block: %5.3f s  gap avg: %6.1f ms" \
+            "  max: %6.1f ms" % (
+                name,
+                elapsed,
+                app.played[0][0] - start,
+                sum(gaps) / len(gaps) * 1000,
+                max(gaps) * 1000)
+
+
+if __name__ == "__main__":
+    main()
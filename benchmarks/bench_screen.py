@@ -0,0 +1,122 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Measures what Application.update_screen costs the caller per update: the
+old urllib2 POST to /update/, answered with the rendered index.html, and a
+datagram on the screen socket.
+
+Usage: python benchmarks/bench_screen.py [updates]
+"""
+
+import BaseHTTPServer
+import os
+import socket
+import sys
+import time
+import urllib
+import urllib2
+
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from screen import (  # NOQA
+    bind_screen_socket, MAX_MESSAGE_BYTES, parse_message, ScreenClient)
+
+PORT = 8765
+SOCKET_FILE = "/tmp/bench_screen.sock"
+TEMPLATE = os.path.join(
+    os.path.dirname(__file__), "..", "template", "index.html")
+HTML = "computer: The weather in Vancouver is light rain, 12 degrees "
+CSS = {"background-color": "white"}
+
+
+class UpdateHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Stands in for the Flask /update/ route, rendering the page """
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with open(TEMPLATE) as f:
+            page = f.read().replace("{{port}}", "8000")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, *args):
+        pass
+
+
+def http_update_screen(html=None, css=None):
+    """ update_screen as it was before the screen socket """
+    url = "http://127.0.0.1:%d/update/" % PORT
+    user_agent = "Mozilla/4.0 (compatible; MSIE 5.5; Windows NT)"
+    values = {"html": html, "css": css}
+    headers = {"User-Agent": user_agent}
+    data = urllib.urlencode(values)
+    req = urllib2.Request(url, data, headers)
+    response = urllib2.urlopen(req)
+    response.read()
+
+
+def receive_updates(sock, received):
+    while True:
+        if parse_message(sock.recv(MAX_MESSAGE_BYTES)):
+            received.append(time.time())
+
+
+def run(name, update, updates):
+    start = time.time()
+    for i in range(updates):
+        update(html=HTML, css=CSS)
+    elapsed = time.time() - start
+    print "%-8s %8.3f ms/update" % (name, elapsed / updates * 1000)
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    httpd = BaseHTTPServer.HTTPServer(("127.0.0.1", PORT), UpdateHandler)
+    thread = Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    received = []
+    sock = bind_screen_socket(
+        socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM), SOCKET_FILE)
+    thread = Thread(target=receive_updates, args=(sock, received))
+    thread.daemon = True
+    thread.start()
+
+    run("http", http_update_screen, updates)
+    client = ScreenClient(path=SOCKET_FILE)
+    run("socket", client.update, updates)
+    time.sleep(0.2)
+    print "socket   %d of %d updates received, %d dropped" % (
+        len(received), updates, client.dropped)
+    httpd.shutdown()
+    os.remove(SOCKET_FILE)
+
+
+if __name__ == "__main__":
+    main()
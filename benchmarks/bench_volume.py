@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Compares the sox | awk volume measurement with the NumPy one on the same
+one second recording, read from a file and from memory.
+
+Usage: python benchmarks/bench_volume.py [rounds]
+"""
+
+import math
+import os
+import struct
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from listener import Listener, measure_volume  # NOQA
+
+SAMPLE_RATE = 48000
+WAV_FILE = "/tmp/bench_volume.wav"
+
+
+def make_pcm(seconds=1.0, amplitude=0.3):
+    return "".join(
+        struct.pack("<h", int(amplitude * 32767 * math.sin(i * 0.05)))
+        for i in range(int(SAMPLE_RATE * seconds)))
+
+
+def write_wav(file, pcm):
+    f = wave.open(file, "wb")
+    f.setnchannels(1)
+    f.setsampwidth(2)
+    f.setframerate(SAMPLE_RATE)
+    f.writeframes(pcm)
+    f.close()
+
+
+def run(name, func, rounds):
+    start = time.time()
+    for i in range(rounds):
+        vol = func()
+    elapsed = time.time() - start
+    print "%-14s %8.2f ms/measurement  volume %.4f" % (
+        name, elapsed / rounds * 1000, vol)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    pcm = make_pcm()
+    write_wav(WAV_FILE, pcm)
+    listener = Listener(sample_rate=SAMPLE_RATE)
+
+    if os.path.exists("/usr/bin/sox"):
+        run("sox file", lambda: listener.get_volume_sox(WAV_FILE), rounds)
+    else:
+        print "sox file       skipped, /usr/bin/sox not found"
+    run("numpy file", lambda: listener.get_volume(WAV_FILE), rounds)
+    run("numpy memory", lambda: measure_volume(pcm)["peak"], rounds)
+    os.remove(WAV_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,33 +23,116 @@
 from configobj import ConfigObj
 from validate import Validator
 
+import hashlib
+import json
 import os
 
 import libs
 
 
-def import_config_spec():
+# Merged plugin config spec, so loading the config needs no plugin imports
+PLUGIN_MANIFEST = ".configspec.json"
+PLUGIN_MANIFEST_VERSION = 1
+
+
+def _get_plugins(path):
+    return sorted(
+        plugin for plugin in os.listdir(path)
+        if plugin != "__init__.py" and
+        os.path.isdir(os.path.join(path, plugin)) and
+        os.path.exists(os.path.join(path, plugin, "__init__.py")))
+
+
+def _get_plugin_files(path):
+    """ Returns the source and ini files of the plugins, relative to path """
+    files = []
+    for plugin in _get_plugins(path):
+        for root, dirs, names in os.walk(os.path.join(path, plugin)):
+            dirs[:] = [name for name in dirs if name != "__pycache__"]
+            files.extend(
+                os.path.relpath(os.path.join(root, name), path)
+                for name in names if name.endswith((".py", ".ini")))
+    return sorted(files)
+
+
+def _get_file_entry(filename):
+    stat = os.stat(filename)
+    with open(filename, "rb") as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    return {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": sha1}
+
+
+def _check_manifest(path, manifest):
+    """ Returns (valid, restamped). Files touched but not changed only get
+        their mtime updated, so they are not hashed again next time. """
+    entries = manifest.get("files", {})
+    if sorted(entries) != _get_plugin_files(path):
+        return False, False
+    restamped = False
+    for name, entry in entries.iteritems():
+        filename = os.path.join(path, name)
+        stat = os.stat(filename)
+        if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+        current = _get_file_entry(filename)
+        if current["sha1"] != entry["sha1"]:
+            return False, False
+        entry.update(current)
+        restamped = True
+    return True, restamped
+
+
+def _write_manifest(manifest_file, manifest):
+    try:
+        with open(manifest_file + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.rename(manifest_file + ".tmp", manifest_file)
+    except (IOError, OSError):
+        pass  # Read only install; import the plugins every time
+
+
+def _import_config_spec(path):
     config_specs = []
+    for plugin in _get_plugins(path):
+        module = libs.dynamic_import("plugins." + plugin)
+        if not hasattr(module, "config"):
+            continue
+        module_name = "plugins." + plugin + ".config"
+        config_module = libs.dynamic_import(module_name)
+        if type(config_module.configspec) != ConfigObj:
+            continue
+        config_spec = config_module.configspec.write()
+        section = "[" + module.__name__[len("plugin.") + 1:] + "]"
+        config_spec.insert(1, section)
+        config_specs.extend(config_spec)
+    return config_specs
+
+
+def import_config_spec():
     path, file = os.path.split(os.path.realpath(__file__))
     path = os.path.join(path, "plugins")
-    for plugin in os.listdir(path):
-        if plugin == "__init__.py":
-            continue
-        if (plugin != "__init__.py"
-            and os.path.isdir(os.path.join(path, plugin))
-            and os.path.exists(
-                os.path.join(path, plugin, "__init__.py"))):
-            module = libs.dynamic_import("plugins." + plugin)
-            if not hasattr(module, "config"):
-                continue
-            module_name = "plugins." + plugin + ".config"
-            config_module = libs.dynamic_import(module_name)
-            if type(config_module.configspec) != ConfigObj:
-                continue
-            config_spec = config_module.configspec.write()
-            section = "[" + module.__name__[len("plugin.") + 1:] + "]"
-            config_spec.insert(1, section)
-            config_specs.extend(config_spec)
+    manifest_file = os.path.join(path, PLUGIN_MANIFEST)
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        manifest = {}
+    if manifest.get("version") == PLUGIN_MANIFEST_VERSION:
+        valid, restamped = _check_manifest(path, manifest)
+        if valid:
+            if restamped:
+                _write_manifest(manifest_file, manifest)
+            return manifest["configspec"]
+
+    # Stamped before the import, so a change meanwhile is seen next time
+    files = dict(
+        (name, _get_file_entry(os.path.join(path, name)))
+        for name in _get_plugin_files(path))
+    config_specs = _import_config_spec(path)
+    _write_manifest(manifest_file, {
+        "version": PLUGIN_MANIFEST_VERSION,
+        "files": files,
+        "configspec": config_specs})
     return config_specs
 
 
@@ -66,36 +149,65 @@ logfile = string(max=1024, default="log/psittaceous.log")
 usr_bin = string(max=1024, default="/usr/bin")
 default_path = string(max=1024, default="/home/pi/psittaceous")
 db_file = string(max=1024, default="psittaceous.db")
+corpus_db_file = string(max=1024, default="corpus.db")
 inet_check_max_attempts = integer(1, 10, default=3)
+inet_check_address = string(max=256, default="8.8.8.8:53")
+inet_check_interval_sec = integer(5, 3600, default=30)
 cue = string(max=1024, default="hey ok okay listen")
 screen = boolean(default=False)
+screen_max_clients = integer(1, 100, default=10)
+screen_queue_size = integer(1, 1000, default=64)
+screen_heartbeat_sec = integer(5, 300, default=15)
+screen_coalesce_ms = integer(0, 1000, default=50)
 data_dir = string(max=256, default="data")
+tts_cache_dir = string(max=256, default="tts_cache")
+tts_cache_mb = integer(1, 4096, default=50)
 have_gps = boolean(default=False)
+task_workers = integer(1, 8, default=2)
+stats_interval_sec = integer(0, 86400, default=600)
 
 [sphinx]
 corpus_file = string(max=1024, default="corpus.txt")
 keyword_corpus_file = string(max=1024, default="keyword_corpus.txt")
 combined_corpus_file = string(max=1024, default="combined_corpus.txt")
+command_corpus_file = string(max=1024, default="command_corpus.txt")
+name_corpus_file = string(max=1024, default="name_corpus.txt")
 full_dict_file = string(max=1024, default="full.dict")
 full_lm_file = string(max=1024, default="full.lm")
 command_dict_file = string(max=1024, default="command.dict")
 command_lm_file = string(max=1024, default="command.lm")
 name_dict_file = string(max=1024, default="name.dict")
 name_lm_file = string(max=1024, default="name.lm")
+base_dict_file = string(max=1024, default="")
+lm_order = integer(1, 5, default=3)
+lm_workers = integer(1, 8, default=2)
 timeout_sec = integer(10, 255, default=30)
 ctlcount = integer(1, 100, default=10)
+backend = option("inprocess", "subprocess", default="inprocess")
+hmm_dir = string(max=1024, default="")
 
 [addressbook]
 file = string(max=1024, default="data/addressbook.csv")
+fuzzy_accept = float(0.0, 1.0, default=0.9)
+fuzzy_confirm = float(0.0, 1.0, default=0.5)
+reload_interval_sec = integer(0, 3600, default=10)
 
 [audio]
 has_pulse = boolean(default=False)
 out_device = integer(0, 1, default=0)
 in_device = string(max=256, default="plughw:0,0")
 sample_rate = integer(16000, 48000, default=48000)
+capture_buffer_sec = integer(1, 60, default=10)
 min_volume = float(0.0, 10.0, default=0.005)
 idle_duration = float(1.0, 5.0, default=1.5)
+vad_speech_ratio = float(1.5, 20.0, default=3.0)
+vad_hangover_sec = float(0.2, 3.0, default=0.6)
 take_order_duration = float(2.0, 10.0, default=5.0)
+say_lookahead = integer(1, 4, default=2)
+tts_engine = option("auto", "remote", "local", default="auto")
+tts_local_command = string(max=1024, default="espeak")
+tts_max_latency_sec = float(0.1, 10.0, default=1.5)
+tts_prewarm_workers = integer(0, 8, default=2)
 param_terminator = string(max=256, default="over")
 """
 
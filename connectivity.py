@@ -0,0 +1,149 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import socket
+
+from pydispatch import dispatcher
+from threading import Event, Lock, Thread
+
+# Sent with is_up=True or False whenever the connection goes up or down
+INET_STATE_CHANGED = "inet state changed"
+
+
+class ConnectivityMonitor(object):
+    """ Probes the internet connection in a background thread, so callers
+        read the last known state instantly
+
+        The state goes down after down_after failed probes in a row and up
+        after up_after successful ones. While up, the probe runs every
+        interval_sec and a failure is confirmed every retry_sec. While
+        down, the wait doubles from retry_sec up to max_backoff_sec. """
+
+    def __init__(self, address=("8.8.8.8", 53), interval_sec=30,
+                 retry_sec=1.0, max_backoff_sec=60, down_after=3, up_after=2,
+                 timeout_sec=1.0, logger=None):
+        self.address = address
+        self.interval_sec = interval_sec
+        self.retry_sec = retry_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.down_after = down_after
+        self.up_after = up_after
+        self.timeout_sec = timeout_sec
+        self.logger = logger or logging.getLogger(__name__)
+        # None until the first probe, which decides either way
+        self.state = None
+        self.failures = 0
+        self.successes = 0
+        self.lock = Lock()
+        self.wake = Event()
+        self.stopped = Event()
+        self.thread = None
+        self.stats = {
+            "probes": 0,
+            "failed_probes": 0,
+            "transitions": 0
+        }
+
+    @property
+    def is_up(self):
+        return self.state is not False
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(self.timeout_sec + 1.0)
+            self.thread = None
+
+    def probe(self):
+        try:
+            socket.create_connection(self.address, self.timeout_sec).close()
+            return True
+        except (socket.error, socket.timeout):
+            return False
+
+    def report_failure(self):
+        """ Probes now, for callers whose own request just failed """
+        self.wake.set()
+
+    def subscribe(self, func):
+        """ Calls func(is_up) from the monitor thread on every change """
+        dispatcher.connect(
+            func, signal=INET_STATE_CHANGED, sender=dispatcher.Any,
+            weak=False)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["is_up"] = self.state
+        return stats
+
+    def _run(self):
+        while not self.stopped.is_set():
+            delay = self._update(self.probe())
+            self.wake.wait(delay)
+            self.wake.clear()
+
+    def _update(self, ok):
+        """ Records a probe and returns the seconds until the next one """
+        with self.lock:
+            self.stats["probes"] += 1
+            if ok:
+                self.failures = 0
+                self.successes += 1
+                change = self.state is not True and (
+                    self.state is None or self.successes >= self.up_after)
+            else:
+                self.stats["failed_probes"] += 1
+                self.successes = 0
+                self.failures += 1
+                change = self.state is not False and (
+                    self.state is None or self.failures >= self.down_after)
+            if change:
+                self.state = ok
+                self.stats["transitions"] += 1
+        if change:
+            self._notify(ok)
+        if self.state and ok:
+            return self.interval_sec
+        if self.state or ok:
+            return self.retry_sec
+        # Capped, as failures keep counting for as long as the link is down
+        backoff = 2 ** min(max(0, self.failures - self.down_after), 16)
+        return min(self.retry_sec * backoff, self.max_backoff_sec)
+
+    def _notify(self, is_up):
+        self.logger.info("Internet is %s" % ("up" if is_up else "down"))
+        try:
+            dispatcher.send(
+                signal=INET_STATE_CHANGED, sender=self, is_up=is_up)
+        except Exception, e:
+            self.logger.error(e)
@@ -22,7 +22,7 @@
 
 import os
 
-from models import CommandNickname
+from models import nickname_cache
 
 
 class CoreCommands(object):
@@ -93,9 +93,14 @@ class CoreCommands(object):
         self.app.say(self.app.get_ip())
 
     def status_report(self):
+        levels = self.app.vad.get_stats()
         self.app.say(
-            "Current noise level is %.1f" % self.app.vol_average
-            + ". Your voice is %.1f" % self.app.current_volume)
+            "Current noise level is %d decibels" % levels["noise_dbfs"]
+            + ". Your voice is %d decibels" % levels["speech_dbfs"])
+        stats = self.app.decoder.get_stats()
+        self.app.say(
+            "Speech decoder started %d times" % stats["starts"]
+            + " and loaded %d models" % stats["model_loads"])
 
     def turn_on(self, param):
         message = "I don't know how to turn on %s" % param
@@ -137,19 +142,15 @@ class CoreCommands(object):
             self.app.say("What nickname?")
             param = self.app.record_content(duration=5.0)
         nickname = param.strip().lower()
-        cn = CommandNickname.select().where(CommandNickname.nickname==nickname)
-        if cn.count() == 0:
-            CommandNickname.create(
-                nickname=nickname, command=self.app.last_command)
+        if nickname_cache.get(nickname) is None:
+            nickname_cache.set(nickname, self.app.last_command)
             self.app.say("Nickname is created for %s" % self.app.last_command)
             return
         self.app.say("The nickname %s is already taken." % nickname)
         if not self.app.confirm("Do you want to replace?"):
                 self.app.say("Canceled")
                 return
-        cn[0].nickname = nickname
-        cn[0].command = self.app.last_command
-        cn[0].save()
+        nickname_cache.set(nickname, self.app.last_command)
         self.app.say(
             "The nick name is replaced with %s" % self.app.last_command)
 
@@ -0,0 +1,364 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import os
+import re
+import subprocess
+
+from collections import deque
+from Queue import Empty, Queue
+from threading import Lock, Thread
+
+try:
+    import pocketsphinx
+except ImportError:
+    pocketsphinx = None
+
+import libs
+
+from vad import EnergyVad, SPEECH_ENDED, SPEECH_STARTED
+
+# Kinds of SphinxEvent
+READY = "ready"
+SPEECH_START = "speech start"
+SPEECH_END = "speech end"
+HYPOTHESIS = "hypothesis"
+
+SAMPLE_RATE = 16000
+
+# How pocketsphinx_continuous prints a hypothesis: "000000001: hello"
+HYPOTHESIS_RE = re.compile(r"\d{9}: (.*)")
+
+
+class SphinxEvent(object):
+    """ What read_event returns. timestamp is from libs.monotonic() and
+        utterance_id counts utterances since the decoder was created """
+
+    __slots__ = ("kind", "utterance_id", "timestamp", "text")
+
+    def __init__(self, kind, utterance_id, text=None, timestamp=None):
+        self.kind = kind
+        self.utterance_id = utterance_id
+        self.text = text
+        self.timestamp = timestamp or libs.monotonic()
+
+    def __repr__(self):
+        return "<SphinxEvent %s #%d %r>" % (
+            self.kind, self.utterance_id, self.text)
+
+
+def create_decoder(backend, capture, default_path, ctlcount, hmm_dir=None,
+                   vad=None, logger=None):
+    """ Returns the decoder for the backend, falling back to
+        pocketsphinx_continuous if the PocketSphinx bindings are missing """
+    logger = logger or logging.getLogger(__name__)
+    if backend == "inprocess":
+        if pocketsphinx is not None:
+            return InProcessDecoder(
+                capture=capture, hmm_dir=hmm_dir, vad=vad, logger=logger)
+        logger.info(
+            "PocketSphinx bindings not found. Using pocketsphinx_continuous")
+    return SubprocessDecoder(
+        default_path=default_path, ctlcount=ctlcount, logger=logger)
+
+
+class SubprocessDecoder(object):
+    """ Runs pocketsphinx_continuous and parses what it prints
+
+        The process cannot switch models or pause, so every switch, suspend
+        and reset costs a process start and a model load. """
+
+    def __init__(self, default_path, ctlcount=10, logger=None):
+        self.default_path = default_path
+        self.ctlcount = ctlcount
+        self.logger = logger or logging.getLogger(__name__)
+        self.process = None
+        self.utterance_id = 0
+        self.stats = {"starts": 0, "model_loads": 0, "switches": 0}
+
+    def preload(self, models):
+        pass
+
+    def reload(self, models):
+        """ Every start loads the files again """
+        pass
+
+    def start(self, lm_file, dict_file):
+        if self.is_alive():
+            self.stop()
+            self.stats["switches"] += 1
+        self.stats["starts"] += 1
+        self.stats["model_loads"] += 1
+        args = (
+            "pocketsphinx_continuous",
+            "-lm",
+            lm_file,
+            "-dict",
+            dict_file,
+            "-ctlcount",
+            "%d" % self.ctlcount,
+        )
+        self.process = subprocess.Popen(
+            " ".join(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            shell=True)
+
+    def stop(self):
+        os.system(self.default_path + "/bin/killps")
+        self.process = None
+
+    def suspend(self):
+        self.stop()
+
+    def resume(self):
+        pass
+
+    def reset(self):
+        self.stop()
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def read_event(self):
+        """ Blocks until the next event. Returns None once stopped """
+        process = self.process
+        while process:
+            output = process.stdout.readline()
+            if not output:
+                break
+            if "READY" in output:
+                return SphinxEvent(READY, self.utterance_id)
+            if "Listening..." in output:
+                self.utterance_id += 1
+                return SphinxEvent(SPEECH_START, self.utterance_id)
+            if "Stopped listening" in output:
+                return SphinxEvent(SPEECH_END, self.utterance_id)
+            m = HYPOTHESIS_RE.search(output)
+            if m:
+                return SphinxEvent(HYPOTHESIS, self.utterance_id, m.group(1))
+        return None
+
+
+class InProcessDecoder(object):
+    """ Decodes audio from a listener.CaptureStream with the PocketSphinx
+        bindings
+
+        A decoder is loaded once per model and kept warm, so switching
+        models only swaps the active one, and suspending only stops feeding
+        it audio. Utterances are cut by a vad.EnergyVad. """
+
+    def __init__(self, capture, hmm_dir=None, vad=None, logger=None):
+        self.capture = capture
+        self.hmm_dir = hmm_dir
+        self.vad = vad or EnergyVad(sample_rate=SAMPLE_RATE)
+        self.logger = logger or logging.getLogger(__name__)
+        self.decoders = {}
+        self.decoder = None
+        self.suspended = False
+        self.interrupted = False
+        self.lock = Lock()
+        self.reader = None
+        self.thread = None
+        self.events = Queue()
+        self.utterance_id = 0
+        self.stats = {
+            "starts": 0, "model_loads": 0, "switches": 0, "suspends": 0}
+
+    def preload(self, models):
+        for lm_file, dict_file in models:
+            try:
+                self._get_decoder(lm_file, dict_file)
+            except Exception, e:
+                self.logger.error(
+                    "Could not load %s and %s: %s" % (lm_file, dict_file, e))
+
+    def reload(self, models):
+        """ Loads models again after their files changed. A decoder in use
+            is swapped for the new one at the next utterance. """
+        for key in models:
+            with self.lock:
+                old = self.decoders.get(key)
+            if old is None:
+                continue
+            # Loaded outside the lock, so decoding goes on meanwhile
+            try:
+                decoder = self._load(*key)
+            except Exception, e:
+                self.logger.error(
+                    "Could not reload %s and %s: %s" % (key + (e,)))
+                continue
+            with self.lock:
+                if self.decoders.get(key) is old:
+                    self.decoders[key] = decoder
+                if self.decoder is old:
+                    self.decoder = decoder
+                    self.interrupted = True
+
+    def start(self, lm_file, dict_file):
+        try:
+            decoder = self._get_decoder(lm_file, dict_file)
+        except Exception, e:
+            self.logger.error(
+                "Could not load %s and %s: %s" % (lm_file, dict_file, e))
+            if self.decoder is None:
+                return
+            # Keep listening with the model already in use
+            decoder = self.decoder
+        with self.lock:
+            if self.decoder is not None and decoder is not self.decoder:
+                self.stats["switches"] += 1
+                self.interrupted = True
+            self.decoder = decoder
+            self.suspended = False
+        if self.is_alive():
+            return
+        self.stop()
+        self.stats["starts"] += 1
+        self.events = Queue()
+        self.capture.start()
+        self.reader = self.capture.reader()
+        self.thread = Thread(target=self._decode, args=(self.reader,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stops decoding. The capture keeps running for other readers """
+        if self.thread is None:
+            return
+        self.reader.close()
+        self.thread.join()
+        self.reader = None
+        self.thread = None
+
+    def suspend(self):
+        with self.lock:
+            if not self.suspended:
+                self.stats["suspends"] += 1
+            self.suspended = True
+        # Drop what was decoded before the suspend
+        try:
+            while True:
+                self.events.get_nowait()
+        except Empty:
+            pass
+
+    def resume(self):
+        with self.lock:
+            self.suspended = False
+
+    def reset(self):
+        """ Abandons the utterance in progress """
+        with self.lock:
+            self.interrupted = True
+
+    def is_alive(self):
+        return (
+            self.thread is not None and self.thread.is_alive() and
+            self.capture.is_alive())
+
+    def read_event(self):
+        """ Blocks until the next event. Returns None once stopped """
+        return self.events.get()
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def _get_decoder(self, lm_file, dict_file):
+        key = (lm_file, dict_file)
+        with self.lock:
+            decoder = self.decoders.get(key)
+        if decoder is None:
+            decoder = self._load(lm_file, dict_file)
+            with self.lock:
+                decoder = self.decoders.setdefault(key, decoder)
+        return decoder
+
+    def _load(self, lm_file, dict_file):
+        self.logger.debug("Loading %s and %s" % (lm_file, dict_file))
+        kwargs = {"lm": lm_file, "dict": dict_file}
+        if self.hmm_dir:
+            kwargs["hmm"] = self.hmm_dir
+        decoder = pocketsphinx.Decoder(**kwargs)
+        with self.lock:
+            self.stats["model_loads"] += 1
+        return decoder
+
+    def _put(self, kind, text=None):
+        self.events.put(SphinxEvent(kind, self.utterance_id, text))
+
+    def _decode(self, reader):
+        # Chunks just before speech is detected, so onsets are not clipped
+        preroll = deque(maxlen=3)
+        # Decoder of the utterance in progress
+        active = None
+        self._put(READY)
+        while True:
+            chunk = reader.read()
+            if chunk is None:
+                break
+            with self.lock:
+                decoder = self.decoder
+                suspended = self.suspended
+                interrupted = self.interrupted
+                self.interrupted = False
+            if active is not None and (
+                    suspended or interrupted or decoder is not active):
+                active.end_utt()
+                active = None
+                self.vad.reset()
+                self._put(READY)
+            if suspended:
+                preroll.clear()
+                continue
+            state = self.vad.process(chunk)
+            buf = chunk.tostring()
+            if active is None:
+                preroll.append(buf)
+                if state != SPEECH_STARTED:
+                    continue
+                active = decoder
+                self.utterance_id += 1
+                self._put(SPEECH_START)
+                active.start_utt()
+                for buf in preroll:
+                    active.process_raw(buf, False, False)
+                preroll.clear()
+                continue
+            active.process_raw(buf, False, False)
+            if state != SPEECH_ENDED:
+                continue
+            self._put(SPEECH_END)
+            active.end_utt()
+            hyp = active.get_hyp()[0]
+            active = None
+            if hyp:
+                self._put(HYPOTHESIS, hyp)
+            self._put(READY)
+        if active is not None:
+            active.end_utt()
+            self.vad.reset()
+        self.events.put(None)
@@ -20,9 +20,39 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import ctypes
+import ctypes.util
 import os
 import subprocess
 import threading
+import time
+
+
+CLOCK_MONOTONIC = 1  # From linux/time.h
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+try:
+    _clock_gettime = ctypes.CDLL(
+        ctypes.util.find_library("rt") or "librt.so.1",
+        use_errno=True).clock_gettime
+    _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+except (OSError, AttributeError):
+    _clock_gettime = None
+
+
+def monotonic():
+    """ Seconds from an arbitrary point that never goes backwards
+        Falls back to time.time() where clock_gettime is not available """
+    if _clock_gettime is None:
+        return time.time()
+    ts = _Timespec()
+    if _clock_gettime(CLOCK_MONOTONIC, ctypes.pointer(ts)) != 0:
+        return time.time()
+    return ts.tv_sec + ts.tv_nsec * 1e-9
 
 
 def dynamic_import(module_name, module_globals=None):
@@ -0,0 +1,324 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import re
+
+from threading import Lock
+
+VOWELS = "AEIOU"
+FRONT_VOWELS = "EIY"
+# Letters that turn a following H silent
+_H_MODIFIERS = "CSPTG"
+_INITIAL_SILENT = ("AE", "GN", "KN", "PN", "WR")
+_NON_LETTERS_RE = re.compile(r"[^A-Z]")
+
+
+def metaphone(word):
+    """ Returns the Metaphone key of a word, the same for most spellings
+        that sound alike, such as "jon" and "john" """
+    word = _NON_LETTERS_RE.sub("", word.upper())
+    if not word:
+        return ""
+    if word[:2] in _INITIAL_SILENT:
+        word = word[1:]
+    elif word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    key = []
+    size = len(word)
+    for i, c in enumerate(word):
+        prev = word[i - 1] if i > 0 else ""
+        next = word[i + 1] if i + 1 < size else ""
+        after = word[i + 2] if i + 2 < size else ""
+        if c == prev and c != "C":
+            continue
+        if c in VOWELS:
+            if i == 0:
+                key.append(c)
+        elif c == "B":
+            if not (prev == "M" and i == size - 1):
+                key.append("B")
+        elif c == "C":
+            if next == "I" and after == "A":
+                key.append("X")
+            elif next == "H":
+                key.append("K" if prev == "S" else "X")
+            elif next in FRONT_VOWELS and next:
+                if prev != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif c == "D":
+            if next == "G" and after and after in FRONT_VOWELS:
+                key.append("J")
+            else:
+                key.append("T")
+        elif c == "G":
+            if next == "H" and i + 2 < size and after not in VOWELS:
+                continue
+            if next == "N" and (i + 2 == size or word[i + 1:] == "NED"):
+                continue
+            if next and next in FRONT_VOWELS and prev != "G":
+                key.append("J")
+            else:
+                key.append("K")
+        elif c == "H":
+            if prev and prev in _H_MODIFIERS:
+                continue
+            if prev in VOWELS and prev and not (next and next in VOWELS):
+                continue
+            key.append("H")
+        elif c == "K":
+            if prev != "C":
+                key.append("K")
+        elif c == "P":
+            key.append("F" if next == "H" else "P")
+        elif c == "Q":
+            key.append("K")
+        elif c == "S":
+            if next == "H" or (next == "I" and after in ("O", "A") and after):
+                key.append("X")
+            else:
+                key.append("S")
+        elif c == "T":
+            if next == "I" and after in ("O", "A") and after:
+                key.append("X")
+            elif next == "H":
+                key.append("0")
+            elif not (next == "C" and after == "H"):
+                key.append("T")
+        elif c == "V":
+            key.append("F")
+        elif c in "WY":
+            if next and next in VOWELS:
+                key.append(c)
+        elif c == "X":
+            key.append("KS")
+        elif c == "Z":
+            key.append("S")
+        else:
+            key.append(c)
+    return "".join(key)
+
+
+def get_phonetic_key(phrase):
+    return " ".join(metaphone(word) for word in phrase.split())
+
+
+def levenshtein_from(a):
+    """ Returns a function giving the number of single character edits from
+        a to its argument
+
+        Uses Myers' bit-parallel algorithm, one pass over the argument with
+        a's positions as the bits of an integer. """
+    size = len(a)
+    if not size:
+        return len
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | 1 << i
+    mask = (1 << size) - 1
+    high = 1 << (size - 1)
+
+    def distance(b):
+        pv = mask
+        mv = 0
+        score = size
+        for c in b:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = (ph << 1) | 1
+            mh <<= 1
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv
+        return score
+    return distance
+
+
+def levenshtein(a, b):
+    """ Returns the number of single character edits from a to b """
+    return levenshtein_from(a)(b)
+
+
+class BKTree(object):
+    """ Finds the words within an edit distance of a word without comparing
+        it to all of them """
+
+    def __init__(self, words=(), distance_from=levenshtein_from):
+        self.distance_from = distance_from
+        # (word, {distance: child})
+        self.root = None
+        self.size = 0
+        # Removed words stay in the tree to route searches, but are not found
+        self.removed = set()
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            self.size = 1
+            return
+        distance = self.distance_from(word)
+        node = self.root
+        while True:
+            d = distance(node[0])
+            if d == 0:
+                if word in self.removed:
+                    self.removed.discard(word)
+                    self.size += 1
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (word, {})
+                self.size += 1
+                return
+            node = child
+
+    def remove(self, word):
+        """ The caller knows the word is in the tree """
+        if word not in self.removed:
+            self.removed.add(word)
+            self.size -= 1
+
+    def search(self, word, max_distance):
+        """ Returns [(distance, word)] closest first """
+        if self.root is None:
+            return []
+        distance = self.distance_from(word)
+        found = []
+        pending = [self.root]
+        while pending:
+            candidate, children = pending.pop()
+            d = distance(candidate)
+            if d <= max_distance and candidate not in self.removed:
+                found.append((d, candidate))
+            for child_d, child in children.iteritems():
+                if d - max_distance <= child_d <= d + max_distance:
+                    pending.append(child)
+        found.sort()
+        return found
+
+
+class NameIndex(object):
+    """ Finds the names a misheard phrase most likely meant
+
+        Names are indexed once by their phonetic key and in a BK-tree. A
+        match has a confidence from 0 to 1: 1 for the exact name, otherwise
+        the share of letters that match, part of the way closer to 1 for a
+        name that sounds the same. """
+
+    def __init__(self, names=(), max_distance=2, margin=0.1):
+        self.max_distance = max_distance
+        # Matches this close to the best make the best one ambiguous
+        self.margin = margin
+        self.names = set()
+        self.phonetic = {}
+        self.tree = BKTree()
+        # Lookups may run while another thread updates the names
+        self.lock = Lock()
+        self.update_lock = Lock()
+        self.update(added=names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        with self.lock:
+            self._add(name)
+
+    def remove(self, name):
+        with self.lock:
+            self._remove(name)
+
+    def update(self, added=(), removed=()):
+        """ Adds and removes names one at a time, so lookups go on while a
+            large address book is indexed """
+        with self.update_lock:
+            for name in removed:
+                self.remove(name)
+            for name in added:
+                self.add(name)
+
+    def find(self, phrase, limit=3):
+        """ Returns [(name, confidence)] most likely first """
+        with self.lock:
+            return self._find(phrase, limit)
+
+    def _add(self, name):
+        if name in self.names:
+            return
+        self.names.add(name)
+        self.phonetic.setdefault(get_phonetic_key(name), []).append(name)
+        self.tree.add(name)
+
+    def _remove(self, name):
+        if name not in self.names:
+            return
+        self.names.discard(name)
+        key = get_phonetic_key(name)
+        self.phonetic[key].remove(name)
+        if not self.phonetic[key]:
+            del self.phonetic[key]
+        self.tree.remove(name)
+
+    def _find(self, phrase, limit):
+        if phrase in self.names:
+            return [(phrase, 1.0)]
+        scores = {}
+        for name in self.phonetic.get(get_phonetic_key(phrase), []):
+            similarity = self._get_similarity(phrase, name)
+            scores[name] = similarity + 0.25 * (1.0 - similarity)
+        # Allow fewer edits in short names, where each counts for more
+        max_distance = min(self.max_distance, len(phrase) // 3)
+        for d, name in self.tree.search(phrase, max_distance):
+            score = 1.0 - float(d) / max(len(phrase), len(name))
+            scores[name] = max(scores.get(name, 0.0), score)
+        matches = sorted(
+            scores.items(), key=lambda item: (-item[1], item[0]))
+        return matches[:limit]
+
+    def get_best(self, phrase):
+        """ Returns (name, confidence, ambiguous) or (None, 0.0, False).
+            ambiguous is True if another name scored within the margin. """
+        matches = self.find(phrase, limit=2)
+        if not matches:
+            return None, 0.0, False
+        name, confidence = matches[0]
+        ambiguous = (
+            len(matches) > 1 and confidence - matches[1][1] < self.margin)
+        return name, confidence, ambiguous
+
+    def _get_similarity(self, a, b):
+        return 1.0 - float(levenshtein(a, b)) / max(len(a), len(b), 1)
@@ -0,0 +1,301 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import hashlib
+import logging
+import math
+import os
+import re
+
+from multiprocessing import Pool
+
+logger = logging.getLogger(__name__)
+
+# Bump when the output for the same input changes
+VERSION = "1"
+# The dictionary that comes with pocketsphinx
+BASE_DICT_FILE = "/usr/local/share/pocketsphinx/model/lm/en_US/cmu07a.dic"
+START = "<s>"
+END = "</s>"
+# log10 of the probability given to what is never predicted, as lmtool does
+NEVER = -99.0
+# Sentences per process when counting in parallel
+CHUNK_LINES = 20000
+
+_WORD_RE = re.compile(r"[^\w']+", re.UNICODE)
+_VARIANT_RE = re.compile(r"\(\d+\)$")
+
+# Letter to sound rules for words the base dictionary does not have, tried
+# longest first. Rough, but better than a word the decoder cannot hear.
+_LETTER_SOUNDS = {
+    "tch": "CH", "igh": "AY", "ch": "CH", "sh": "SH", "th": "TH",
+    "ph": "F", "ng": "NG", "ck": "K", "qu": "K W", "wh": "W", "ee": "IY",
+    "oo": "UW", "ea": "IY", "ai": "EY", "ay": "EY", "oa": "OW", "ou": "AW",
+    "ow": "OW", "oi": "OY", "oy": "OY", "au": "AO", "aw": "AO", "a": "AE",
+    "b": "B", "c": "K", "d": "D", "e": "EH", "f": "F", "g": "G", "h": "HH",
+    "i": "IH", "j": "JH", "k": "K", "l": "L", "m": "M", "n": "N", "o": "AA",
+    "p": "P", "q": "K", "r": "R", "s": "S", "t": "T", "u": "AH", "v": "V",
+    "w": "W", "x": "K S", "y": "Y", "z": "Z"}
+_DIGIT_SOUNDS = {
+    "0": "Z IH R OW", "1": "W AH N", "2": "T UW", "3": "TH R IY",
+    "4": "F AO R", "5": "F AY V", "6": "S IH K S", "7": "S EH V AH N",
+    "8": "EY T", "9": "N AY N"}
+# Words with none of these cannot be spelled out, so are left out
+_SPEAKABLE_RE = re.compile(r"[a-z0-9]")
+
+
+def tokenize(line):
+    return [
+        word.upper() for word in _WORD_RE.split(line.lower())
+        if _SPEAKABLE_RE.search(word)]
+
+
+def _count_chunk(args):
+    lines, order = args
+    counts = [{} for n in range(order)]
+    for line in lines:
+        words = tokenize(line)
+        if not words:
+            continue
+        words = [START] + words + [END]
+        for n in range(1, order + 1):
+            table = counts[n - 1]
+            for i in range(len(words) - n + 1):
+                gram = tuple(words[i:i + n])
+                table[gram] = table.get(gram, 0) + 1
+    return counts
+
+
+def count_ngrams(lines, order=3, workers=1):
+    """ Returns a dict of n-gram counts for each n up to order. Workers fork
+        the process, so only use them from a process without threads. """
+    if workers <= 1 or len(lines) <= CHUNK_LINES:
+        return _count_chunk((lines, order))
+    chunks = [
+        (lines[i:i + CHUNK_LINES], order)
+        for i in range(0, len(lines), CHUNK_LINES)]
+    pool = Pool(workers)
+    try:
+        results = pool.map(_count_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+    counts = results[0]
+    for result in results[1:]:
+        for table, other in zip(counts, result):
+            for gram, count in other.iteritems():
+                table[gram] = table.get(gram, 0) + count
+    return counts
+
+
+def _get_discount(table):
+    """ Absolute discount from the counts of counts, as Ney et al. """
+    n1 = sum(1 for count in table.itervalues() if count == 1)
+    n2 = sum(1 for count in table.itervalues() if count == 2)
+    if not n1 or not n2:
+        return 0.5
+    return min(0.9, max(0.1, float(n1) / (n1 + 2 * n2)))
+
+
+class BackoffModel(object):
+    """ An n-gram model with absolute discounting and back-off weights,
+        as written to an ARPA file """
+
+    def __init__(self, counts):
+        self.order = len(counts)
+        # n-gram to log10 probability and history to log10 back-off weight
+        self.probs = [{} for n in range(self.order)]
+        self.backoffs = [{} for n in range(self.order)]
+        unigrams = counts[0]
+        total = float(sum(
+            count for gram, count in unigrams.iteritems()
+            if gram[0] != START))
+        for gram, count in unigrams.iteritems():
+            self.probs[0][gram] = (
+                NEVER if gram[0] == START else math.log10(count / total))
+        for n in range(2, self.order + 1):
+            self._add_order(n, counts[n - 1])
+
+    def get_prob(self, gram):
+        """ Returns the probability of the last word after the others """
+        n = len(gram)
+        logprob = self.probs[n - 1].get(gram)
+        if logprob is not None:
+            return 10 ** logprob if logprob > NEVER else 0.0
+        if n == 1:
+            return 0.0
+        backoff = self.backoffs[n - 2].get(gram[:-1], 0.0)
+        return 10 ** backoff * self.get_prob(gram[1:])
+
+    def _add_order(self, n, table):
+        discount = _get_discount(table)
+        followers = {}
+        for gram, count in table.iteritems():
+            followers.setdefault(gram[:-1], []).append((gram, count))
+        for history, grams in followers.iteritems():
+            total = float(sum(count for gram, count in grams))
+            seen = 0.0
+            seen_lower = 0.0
+            for gram, count in grams:
+                prob = (count - discount) / total
+                self.probs[n - 1][gram] = math.log10(prob)
+                seen += prob
+                seen_lower += self.get_prob(gram[1:])
+            left = max(1.0 - seen, 1e-9)
+            left_lower = max(1.0 - seen_lower, 1e-9)
+            self.backoffs[n - 2][history] = math.log10(left / left_lower)
+
+    def write_arpa(self, f):
+        f.write("\\data\\\n")
+        for n in range(1, self.order + 1):
+            f.write("ngram %d=%d\n" % (n, len(self.probs[n - 1])))
+        for n in range(1, self.order + 1):
+            f.write("\n\\%d-grams:\n" % n)
+            backoffs = self.backoffs[n - 1] if n < self.order else {}
+            for gram in sorted(self.probs[n - 1]):
+                line = "%.4f %s" % (self.probs[n - 1][gram], " ".join(gram))
+                if gram in backoffs:
+                    line += " %.4f" % backoffs[gram]
+                f.write(line.encode("utf-8") + "\n")
+        f.write("\n\\end\\\n")
+
+
+def guess_pronunciation(word):
+    """ Spells out a word by rough English letter to sound rules, and digits
+        one by one """
+    word = re.sub(r"[^a-z0-9]", "", word.lower())
+    if len(word) > 3 and word.endswith("e") and word[-2] not in "aeiou":
+        word = word[:-1]  # Silent final e
+    phones = []
+    i = 0
+    while i < len(word):
+        for size in (3, 2, 1):
+            key = word[i:i + size]
+            sound = _LETTER_SOUNDS.get(key) or _DIGIT_SOUNDS.get(key)
+            if sound:
+                break
+        size = len(key)
+        # A doubled consonant is said once, as in "call" and "off"
+        if not (size == 1 and i > 0 and key == word[i - 1] and
+                key not in _DIGIT_SOUNDS):
+            phones.append(sound)
+        i += size
+    if phones and word.endswith("y") and len(word) > 1:
+        phones[-1] = "IY"
+    return " ".join(phones)
+
+
+def load_pronunciations(dict_file, words):
+    """ Returns {word: [pronunciation]} from a CMU style dictionary, only
+        for the words asked for """
+    pronunciations = {}
+    dict_file = dict_file or BASE_DICT_FILE
+    if not os.path.exists(dict_file):
+        return pronunciations
+    with open(dict_file) as f:
+        for line in f:
+            parts = line.split(None, 1)
+            if len(parts) < 2 or line.startswith(";;;"):
+                continue
+            word = _VARIANT_RE.sub("", parts[0]).upper()
+            if word in words:
+                pronunciations.setdefault(word, []).append(parts[1].strip())
+    return pronunciations
+
+
+def write_dictionary(f, words, base_dict_file=None):
+    """ Writes a pronunciation for every word and returns the words that
+        had to be guessed """
+    pronunciations = load_pronunciations(base_dict_file, words)
+    guessed = []
+    for word in sorted(words):
+        variants = pronunciations.get(word)
+        if not variants:
+            variants = [guess_pronunciation(word)]
+            guessed.append(word)
+        for i, phones in enumerate(variants):
+            name = word if i == 0 else "%s(%d)" % (word, i + 1)
+            f.write(("%s\t%s\n" % (name, phones)).encode("utf-8"))
+    return guessed
+
+
+def get_input_hash(corpus_file, base_dict_file=None, order=3):
+    sha1 = hashlib.sha1("%s %d\n" % (VERSION, order))
+    with open(corpus_file, "rb") as f:
+        for block in iter(lambda: f.read(65536), ""):
+            sha1.update(block)
+    base_dict_file = base_dict_file or BASE_DICT_FILE
+    if os.path.exists(base_dict_file):
+        stat = os.stat(base_dict_file)
+        sha1.update("%s %d %d" % (base_dict_file, stat.st_mtime, stat.st_size))
+    return sha1.hexdigest()
+
+
+def _is_built(input_hash, dict_file, lm_file):
+    try:
+        with open(lm_file + ".sha1") as f:
+            built = f.read().strip() == input_hash
+    except IOError:
+        return False
+    return built and os.path.exists(dict_file) and os.path.exists(lm_file)
+
+
+def is_built(corpus_file, dict_file, lm_file, base_dict_file=None, order=3):
+    """ Returns True if the files were built from the corpus as it is now """
+    return _is_built(
+        get_input_hash(corpus_file, base_dict_file, order), dict_file, lm_file)
+
+
+def build_model(corpus_file, dict_file, lm_file, base_dict_file=None,
+                order=3, workers=1):
+    """ Builds the ARPA language model and the dictionary of a corpus with
+        a sentence per line. Returns False if the corpus did not change
+        since the files were last built. Raises ValueError if the corpus has
+        no sentences, leaving the files as they were. """
+    input_hash = get_input_hash(corpus_file, base_dict_file, order)
+    if _is_built(input_hash, dict_file, lm_file):
+        return False
+
+    with open(corpus_file) as f:
+        lines = [line.decode("utf-8", "replace") for line in f]
+    counts = count_ngrams(lines, order=order, workers=workers)
+    if not counts[0]:
+        # Pocketsphinx cannot load a model without <s> and </s>
+        raise ValueError("No sentences in %s" % corpus_file)
+    model = BackoffModel(counts)
+    words = set(
+        gram[0] for gram in counts[0] if gram[0] not in (START, END))
+
+    # Written aside and renamed, so a decoder never loads half a file
+    with open(lm_file + ".tmp", "w") as f:
+        model.write_arpa(f)
+    with open(dict_file + ".tmp", "w") as f:
+        guessed = write_dictionary(f, words, base_dict_file)
+    os.rename(lm_file + ".tmp", lm_file)
+    os.rename(dict_file + ".tmp", dict_file)
+    with open(lm_file + ".sha1", "w") as f:
+        f.write(input_hash + "\n")
+    if guessed:
+        logger.info(
+            "Guessed the pronunciation of %d words: %s"
+            % (len(guessed), " ".join(guessed[:20])))
+    return True
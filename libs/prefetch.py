@@ -0,0 +1,79 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from Queue import Full, Queue
+from threading import Event, Thread
+
+# Put by the producer after the last item
+_DONE = object()
+
+
+class Prefetcher(object):
+    """ Runs produce over items in a background thread and yields the
+        results in order
+
+        The producer stays at most lookahead results ahead of the consumer.
+        An exception from produce is raised where its result would have
+        been yielded. """
+
+    def __init__(self, items, produce, lookahead=1):
+        self.produce = produce
+        self.queue = Queue(maxsize=lookahead)
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, args=(list(items),))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __iter__(self):
+        while True:
+            value = self.queue.get()
+            if value is _DONE:
+                return
+            result, error = value
+            if error is not None:
+                raise error
+            yield result
+
+    def close(self):
+        """ Stops producing and drops what was not consumed """
+        self.stopped.set()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def _run(self, items):
+        for item in items:
+            if self.stopped.is_set():
+                break
+            try:
+                value = (self.produce(item), None)
+            except Exception, e:
+                value = (None, e)
+            self._put(value)
+        self._put(_DONE)
+
+    def _put(self, value):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(value, True, 0.1)
+                return
+            except Full:
+                continue
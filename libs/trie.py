@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Key of the phrase and value stored at the node where a phrase ends.
+# Words are never None, so it cannot clash with a child.
+_LEAF = None
+
+
+class WordTrie(object):
+    """ Maps phrases to values and finds the longest phrase a text starts
+        with, comparing whole words """
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, phrase):
+        node = self._find_node(phrase.split())
+        return node is not None and _LEAF in node
+
+    def add(self, phrase, value):
+        words = phrase.split()
+        if not words:
+            raise ValueError("Cannot add an empty phrase")
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        if _LEAF not in node:
+            self.size += 1
+        node[_LEAF] = (phrase, value)
+
+    def get(self, phrase, default=None):
+        node = self._find_node(phrase.split())
+        if node is None or _LEAF not in node:
+            return default
+        return node[_LEAF][1]
+
+    def longest_prefix(self, text):
+        """ Returns (phrase, value, rest of text) for the longest phrase
+            text starts with, or None """
+        words = text.split()
+        node = self.root
+        leaf = None
+        length = 0
+        for i, word in enumerate(words):
+            node = node.get(word)
+            if node is None:
+                break
+            if _LEAF in node:
+                leaf = node[_LEAF]
+                length = i + 1
+        if leaf is None:
+            return None
+        phrase, value = leaf
+        return phrase, value, " ".join(words[length:])
+
+    def _find_node(self, words):
+        node = self.root
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return None
+        return node
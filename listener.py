@@ -19,54 +19,204 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
+import logging
+import math
+import numpy
 import os
+import subprocess
+import wave
 
-from time import sleep
+from threading import Condition, Thread
 
 import libs
 
 
+def measure_volume(pcm):
+    """ Peak, RMS and RMS in dBFS of 16 bit little endian mono PCM, given
+        as a string or a NumPy array. Peak and RMS are scaled so that full
+        scale is 1.0 like sox does """
+    if isinstance(pcm, numpy.ndarray):
+        samples = pcm
+    else:
+        samples = numpy.frombuffer(pcm, dtype="<i2")
+    if not len(samples):
+        return {"peak": 0.0, "rms": 0.0, "dbfs": float("-inf")}
+    samples = samples.astype(numpy.float64) / 32768.0
+    peak = float(numpy.abs(samples).max())
+    rms = float(numpy.sqrt(numpy.mean(samples * samples)))
+    dbfs = 20 * math.log10(rms) if rms > 0 else float("-inf")
+    return {"peak": peak, "rms": rms, "dbfs": dbfs}
+
+
+class RingBuffer(object):
+    """ Preallocated ring of 16 bit samples, written one chunk at a time
+
+        Readers get read-only views into the ring rather than copies, so a
+        reader that falls a whole ring behind skips ahead and loses audio.
+    """
+
+    def __init__(self, chunks, chunk_samples):
+        self.chunks = chunks
+        self.chunk_samples = chunk_samples
+        self.data = numpy.zeros(chunks * chunk_samples, dtype="<i2")
+        # Chunks written since the ring was created
+        self.written = 0
+        self.closed = False
+        self.cond = Condition()
+
+    def write_from(self, f):
+        """ Reads the next chunk from file f straight into the ring
+            Returns False at the end of the stream """
+        slot = self.get_chunk(self.written)
+        if f.readinto(slot) < slot.nbytes:
+            return False
+        with self.cond:
+            self.written += 1
+            self.cond.notify_all()
+        return True
+
+    def write(self, samples):
+        """ Copies one chunk of samples into the ring """
+        self.get_chunk(self.written)[:] = samples
+        with self.cond:
+            self.written += 1
+            self.cond.notify_all()
+
+    def get_chunk(self, index):
+        start = (index % self.chunks) * self.chunk_samples
+        return self.data[start:start + self.chunk_samples]
+
+    def open(self):
+        with self.cond:
+            self.closed = False
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def reader(self):
+        """ Returns a reader that starts with the next chunk written """
+        with self.cond:
+            return RingReader(self, self.written)
+
+
+class RingReader(object):
+
+    def __init__(self, ring, position):
+        self.ring = ring
+        self.position = position
+        self.closed = False
+        self.overruns = 0
+
+    def read(self):
+        """ Blocks for the next chunk and returns a read-only view of it
+            Returns None once the reader or the ring is closed """
+        ring = self.ring
+        with ring.cond:
+            while (self.position >= ring.written and
+                    not ring.closed and not self.closed):
+                ring.cond.wait()
+            if self.closed or self.position >= ring.written:
+                return None
+            if ring.written - self.position >= ring.chunks:
+                # The writer is about to overwrite what we would read
+                self.overruns += 1
+                self.position = ring.written - 1
+            chunk = ring.get_chunk(self.position).view()
+            self.position += 1
+        chunk.flags.writeable = False
+        return chunk
+
+    def read_seconds(self, seconds, sample_rate):
+        """ Returns a copy of the next seconds of audio, shorter if the
+            ring is closed before that """
+        chunks = []
+        count = int(math.ceil(seconds * sample_rate / self.ring.chunk_samples))
+        for i in range(count):
+            chunk = self.read()
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        if not chunks:
+            return numpy.zeros(0, dtype="<i2")
+        return numpy.concatenate(chunks)
+
+    def close(self):
+        with self.ring.cond:
+            self.closed = True
+            self.ring.cond.notify_all()
+
+
+class CaptureStream(object):
+    """ A single long-lived arecord writing 16 bit mono PCM into a
+        RingBuffer that any number of readers can follow """
+
+    def __init__(self, hw, sample_rate=16000, buffer_sec=10, chunk_sec=0.1,
+                 logger=None):
+        self.hw = hw
+        self.sample_rate = sample_rate
+        self.chunk_sec = chunk_sec
+        self.logger = logger or logging.getLogger(__name__)
+        self.ring = RingBuffer(
+            chunks=int(buffer_sec / chunk_sec),
+            chunk_samples=int(sample_rate * chunk_sec))
+        self.process = None
+        self.thread = None
+
+    def start(self):
+        if self.is_alive():
+            return
+        self.stop()
+        self.logger.debug("Starting audio capture from %s" % self.hw)
+        self.ring.open()
+        self.process = subprocess.Popen(
+            ["/usr/bin/arecord", "-D", self.hw, "-q", "-t", "raw",
+             "-f", "S16_LE", "-c", "1", "-r", str(self.sample_rate)],
+            stdout=subprocess.PIPE)
+        self.thread = Thread(target=self._capture, args=(self.process,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+        self.process.wait()
+        self.thread.join()
+        self.process = None
+        self.thread = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def reader(self):
+        return self.ring.reader()
+
+    def _capture(self, process):
+        while self.ring.write_from(process.stdout):
+            pass
+        self.ring.close()
+
+
 class Listener(object):
 
     def __init__(self, user="", sample_rate=48000):
         self.sample_rate = sample_rate
         self.user = user
-        self.keep_recording = False
-        self.recording = None
-        self.playing = None
 
     def system(self, cmd):
         return libs.system(command=cmd, user=self.user)
 
-    def continuous_recording(
-            self,
-            file="/tmp/noise%d.flac",
-            hw="plughw:1,0",
-            duration=5,
-            nullout=False):
-        while self.keep_recording:
-            if self.recording is not None:
-                raise Exception("Another thread is recording audio.")
-
-            self.recording = 0
-            if self.playing is not None:
-                self.recording = (self.playing + 1) % 2
-            if os.path.exists(file % self.recording):
-                os.remove(file % self.recording)
-            self.record_flac(
-                file=file % self.recording,
-                hw=hw,
-                duration=duration,
-                nullout=nullout)
-            self.recording = None
-
-    def get_volume(self, file="/tmp/noise%d.flac", rotation=0):
-        if self.playing is not None:
-            raise Exception("Another thread is playing audio.")
-        self.playing = rotation
-        while self.recording == self.playing:
-            sleep(0.5)
-        file = file % self.playing
+    def get_volume(self, file="/tmp/noise0.flac"):
+        """ Max level of the file like sox reports it, -1.0 on failure """
+        pcm = self.read_pcm(file)
+        if not pcm:
+            return -1.0
+        return measure_volume(pcm)["peak"]
+
+    def get_volume_sox(self, file="/tmp/noise0.flac"):
         cmd = (
             "/usr/bin/sox " +
             file +
@@ -76,31 +226,24 @@ class Listener(object):
         f = open("/tmp/volume.txt")
         output = f.read()
         vol = float(output) if output else -1.0
-        self.playing = None
         return vol
 
-    def record_flac(
-            self,
-            file="/tmp/noise0.flac",
-            hw="plughw:1,0",
-            duration=5,
-            nullout=False):
-        if os.path.exists(file):
-            raise Exception("File already exists!")
-
-        cmd = "/usr/bin/arecord -D "
-        cmd += hw
-        cmd += " -q"
-        cmd += " -f cd -t wav -d "
-        cmd += str(duration)
-        cmd += " -r " + str(self.sample_rate)
-        cmd += " | /usr/bin/avconv"
-        cmd += " -loglevel 0 -i - -ar " + str(self.sample_rate)
-        cmd += " " + file
-
-        if nullout:
-            cmd += " 1>>/tmp/voice.log 2>>/tmp/voice.log"
-        self.system(cmd)
+    def read_pcm(self, file):
+        """ Reads a WAV or any file avconv can decode as 16 bit mono PCM """
+        if not os.path.exists(file):
+            return ""
+        if file.endswith(".wav"):
+            f = wave.open(file, "rb")
+            try:
+                if f.getsampwidth() == 2 and f.getnchannels() == 1:
+                    return f.readframes(f.getnframes())
+            finally:
+                f.close()
+        cmd = [
+            "/usr/bin/avconv", "-loglevel", "0", "-i", file,
+            "-f", "s16le", "-ac", "1", "-"]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        return proc.communicate()[0]
 
     def record_wav(
             self,
@@ -122,9 +265,9 @@ class Listener(object):
         self.system(cmd)
 
 if __name__ == "__main__":
-    if os.path.exists("/tmp/noise0.flac"):
-        os.remove("/tmp/noise0.flac")
+    if os.path.exists("/tmp/noise.wav"):
+        os.remove("/tmp/noise.wav")
 
     listener = Listener()
-    listener.record_flac()
-    print listener.get_volume()
+    listener.record_wav()
+    print listener.get_volume("/tmp/noise.wav")
@@ -21,26 +21,39 @@
 # THE SOFTWARE.
 
 from config import config
+import datetime
 import inspect
 import logging
 import os
 import sqlite3
 import sys
 
-from peewee import CharField, Model, SqliteDatabase
+from threading import Lock
+
+from peewee import (
+    CharField, DateTimeField, IntegerField, Model, SqliteDatabase)
 
 
 logger = logging.getLogger(__name__)
 
-sqlite_db = SqliteDatabase(
-    os.path.join(
-        config.get("system")["default_path"],
-        config.get("system")["db_file"]))
+db_file = os.path.join(
+    config.get("system")["default_path"],
+    config.get("system")["db_file"])
+# Commands, plugins and the scheduler use the DB from their own threads
+sqlite_db = SqliteDatabase(db_file, threadlocals=True)
+# The corpus changes with every sentence heard, so it is kept apart from
+# the tables whose file stamp tells when to reload them
+corpus_db_file = os.path.join(
+    config.get("system")["default_path"],
+    config.get("system")["corpus_db_file"])
+corpus_db = SqliteDatabase(corpus_db_file, threadlocals=True)
 
 
 def connect_db():
     sqlite_db.connect()
+    corpus_db.connect()
     init_db()
+    nickname_cache.load()
 
 
 def init_db():
@@ -72,3 +85,124 @@ class BaseModel(Model):
 class CommandNickname(BaseModel):
     nickname = CharField()
     command = CharField()
+
+
+class NicknameCache(object):
+    """ Write-through copy of the CommandNickname table kept in memory
+        Reloaded when the DB file is changed by someone else """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.nicknames = {}
+        self.stamp = None
+        self.lock = Lock()
+
+    def load(self):
+        with self.lock:
+            self.stamp = self._get_stamp()
+            self.nicknames = dict(
+                (cn.nickname, cn.command)
+                for cn in CommandNickname.select())
+        logger.debug("Loaded %d command nicknames" % len(self.nicknames))
+
+    def get(self, nickname):
+        if self._get_stamp() != self.stamp:
+            self.load()
+        return self.nicknames.get(nickname)
+
+    def set(self, nickname, command):
+        """ Creates or replaces the nickname. Returns True if created """
+        with self.lock:
+            query = CommandNickname.select().where(
+                CommandNickname.nickname == nickname)
+            created = query.count() == 0
+            if created:
+                CommandNickname.create(nickname=nickname, command=command)
+            else:
+                CommandNickname.update(command=command).where(
+                    CommandNickname.nickname == nickname).execute()
+            self.nicknames[nickname] = command
+            self.stamp = self._get_stamp()
+        return created
+
+    def _get_stamp(self):
+        try:
+            stat = os.stat(self.db_file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime, stat.st_size)
+
+
+nickname_cache = NicknameCache(db_file)
+
+
+class CorpusSentence(BaseModel):
+    sentence = CharField(unique=True)
+    frequency = IntegerField(default=1)
+    last_seen = DateTimeField()
+
+    class Meta:
+        database = corpus_db
+
+
+class CorpusStore(object):
+    """ Sentences for the language model, each kept once with how often
+        and when it was last seen """
+
+    def __init__(self):
+        self.lock = Lock()
+
+    def add(self, sentence, frequency=1):
+        """ Returns True if the sentence is new """
+        if isinstance(sentence, str):
+            sentence = sentence.decode("utf-8", "replace")
+        now = datetime.datetime.now()
+        with self.lock:
+            updated = CorpusSentence.update(
+                frequency=CorpusSentence.frequency + frequency,
+                last_seen=now).where(
+                    CorpusSentence.sentence == sentence).execute()
+            if not updated:
+                CorpusSentence.create(
+                    sentence=sentence, frequency=frequency, last_seen=now)
+        return not updated
+
+    def count(self):
+        return CorpusSentence.select().count()
+
+    def iter_sentences(self):
+        """ Streams the sentences without loading them all """
+        query = CorpusSentence.select(CorpusSentence.sentence).order_by(
+            CorpusSentence.id)
+        for row in query.iterator():
+            yield row.sentence
+
+    def write(self, f):
+        """ Writes a sentence per line and returns how many """
+        count = 0
+        for sentence in self.iter_sentences():
+            f.write(sentence.encode("utf-8") + "\n")
+            count += 1
+        return count
+
+    def import_file(self, file):
+        """ Moves the sentences of an append-only corpus file into the
+            store, once. The file is renamed so it is not imported again. """
+        if not os.path.exists(file):
+            return 0
+        counts = {}
+        with open(file) as f:
+            for line in f:
+                sentence = line.strip().decode("utf-8", "replace")
+                if sentence:
+                    counts[sentence] = counts.get(sentence, 0) + 1
+        with corpus_db.transaction():
+            for sentence, frequency in counts.iteritems():
+                self.add(sentence, frequency)
+        os.rename(file, file + ".imported")
+        logger.info(
+            "Imported %d corpus sentences from %s" % (len(counts), file))
+        return len(counts)
+
+
+corpus_store = CorpusStore()
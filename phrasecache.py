@@ -0,0 +1,227 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+from collections import OrderedDict
+from threading import Lock
+
+INDEX_FILE = "index.json"
+EXTENSION = ".mp3"
+
+_PUNCTUATION_RE = re.compile(r"[^a-z0-9' ]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    """ Folds the spellings of a phrase that sound the same into one """
+    text = _PUNCTUATION_RE.sub(" ", text.lower().replace("_", " "))
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def get_key(text, voice="en"):
+    phrase = normalize(text)
+    if isinstance(phrase, unicode):
+        phrase = phrase.encode("utf-8")
+    return hashlib.sha1(voice + "\n" + phrase).hexdigest()
+
+
+class PhraseCache(object):
+    """ Synthesized phrases on disk, addressed by the hash of the voice and
+        the normalized text
+
+        The index lives in memory and is saved next to the files. Once the
+        files exceed max_bytes the least recently played are removed.
+        Prompts shipped in pinned_dir are found by their file names and are
+        never evicted. """
+
+    def __init__(self, cache_dir, pinned_dir=None, max_bytes=50 * 1024 * 1024,
+                 logger=None):
+        self.cache_dir = cache_dir
+        self.pinned_dir = pinned_dir
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock = Lock()
+        # Normalized text to path of the shipped prompts
+        self.pinned = {}
+        # Key to {"text", "ext", "size", "used"}, least recently used first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {
+            "hits": 0,
+            "pinned_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+    def load(self):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self._load_pinned()
+        try:
+            with open(self._get_index_file()) as f:
+                saved = json.load(f)
+        except (IOError, ValueError):
+            saved = {}
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            for key, entry in sorted(
+                    saved.items(), key=lambda item: item[1]["used"]):
+                entry.setdefault("ext", EXTENSION)
+                try:
+                    entry["size"] = os.path.getsize(
+                        self._get_file(key, entry["ext"]))
+                except OSError:
+                    continue
+                self.entries[key] = entry
+                self.total_bytes += entry["size"]
+            self._remove_orphans()
+            self._evict()
+            self._save()
+
+    def get(self, text, voice="en"):
+        """ Returns the path of the phrase or None """
+        return self.find(text, [voice])
+
+    def find(self, text, voices):
+        """ Returns the path of the phrase in the first voice that has it
+            or None. Shipped prompts match any voice. """
+        phrase = normalize(text)
+        with self.lock:
+            if phrase in self.pinned:
+                self.stats["pinned_hits"] += 1
+                return self.pinned[phrase]
+            for voice in voices:
+                key = get_key(phrase, voice)
+                entry = self.entries.get(key)
+                # A hash collision is treated as a miss and overwritten
+                if entry is None or entry["text"] != phrase:
+                    continue
+                del self.entries[key]
+                entry["used"] = time.time()
+                self.entries[key] = entry
+                self.stats["hits"] += 1
+                return self._get_file(key, entry["ext"])
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text, fetch, voice="en", ext=EXTENSION):
+        """ Stores what fetch writes into the file object it is passed and
+            returns the path. Readers never see a partial file. """
+        phrase = normalize(text)
+        key = get_key(phrase, voice)
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fetch(f)
+            size = os.path.getsize(tmp_file)
+            os.rename(tmp_file, self._get_file(key, ext))
+        except:
+            os.remove(tmp_file)
+            raise
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry["size"]
+                if entry["ext"] != ext:
+                    self._remove(key, entry["ext"])
+            self.entries[key] = {
+                "text": phrase, "ext": ext, "size": size,
+                "used": time.time()}
+            self.total_bytes += size
+            self.stats["stores"] += 1
+            self._evict(keep=key)
+            self._save()
+        return self._get_file(key, ext)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+            stats["pinned"] = len(self.pinned)
+            stats["bytes"] = self.total_bytes
+        return stats
+
+    def _get_file(self, key, ext=EXTENSION):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def _remove(self, key, ext):
+        try:
+            os.remove(self._get_file(key, ext))
+        except OSError:
+            pass
+
+    def _get_index_file(self):
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _load_pinned(self):
+        pinned = {}
+        if self.pinned_dir and os.path.isdir(self.pinned_dir):
+            for name in os.listdir(self.pinned_dir):
+                if name.endswith(EXTENSION):
+                    pinned[normalize(name[:-len(EXTENSION)])] = os.path.join(
+                        self.pinned_dir, name)
+        with self.lock:
+            self.pinned = pinned
+
+    def _remove_orphans(self):
+        """ Removes files missing from the index and interrupted writes """
+        for name in os.listdir(self.cache_dir):
+            if name == INDEX_FILE:
+                continue
+            key, ext = os.path.splitext(name)
+            if key in self.entries and self.entries[key]["ext"] == ext:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _evict(self, keep=None):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+            entry = self.entries.pop(key)
+            self.total_bytes -= entry["size"]
+            self.stats["evictions"] += 1
+            self._remove(key, entry["ext"])
+            self.logger.debug("Evicted from phrase cache: %s" % entry["text"])
+
+    def _save(self):
+        fd, tmp_file = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entries, f)
+            os.rename(tmp_file, self._get_index_file())
+        except (IOError, OSError), e:
+            self.logger.error("Could not save phrase cache index: %s" % e)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
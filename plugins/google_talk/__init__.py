@@ -98,14 +98,15 @@ class GoogleTalkPlugin(Plugin):
         self.current_connection = connect_object
         if self.app.nickname + ":" == message[0:len(self.app.nickname) + 1]:
             message = message[len(self.app.nickname) + 1:].strip()
-            self.app.messages.put(self.app.nickname + " " + message)
+            self.app.post_message(self.app.nickname + " " + message)
             self.app.add_corpus(message)
         else:
             if self.last_nickname != nickname:
                 text = nickname + " says: " + message
             else:
                 text = message
-            self.app.say(text)
+            # Called on the xmpp thread; speak from the main loop
+            self.app.call_on_main(self.app.say, text)
             self.app.add_corpus(message)
             # Don't update last_from if it is a command
             self.last_from = from_
@@ -91,7 +91,7 @@ class PjTwilioPlugin(Plugin):
         self.redial_number = to_
 
         if "@" in to_:
-            self.app.mute()
+            self.app.mute(release_audio=True)
             self.pj_twilio.make_sip_call("sip:" + to_)
         else:
             self.pj_twilio.make_twilio_call(to_)
@@ -126,15 +126,19 @@ class PjTwilioPlugin(Plugin):
                 caller[-4:])
         except ValueError:
             pass
-        self.app.say("Call from %s" % (number or caller))
+        # pjsua calls back on its own threads; speak from the main loop
+        self.app.call_on_main(self.app.say, "Call from %s" % (number or caller))
         self.call_back_number = caller if number else from_
 
     def pre_session_callback(self):
-        self.app.mute()
+        self.app.mute(release_audio=True)
 
     def post_session_callback(self):
+        self.app.call_on_main(self.end_session)
+
+    def end_session(self):
         self.app.say("Call ended", cache=True)
         self.app.unmute()
 
     def error_callback(self, message):
-        self.app.say(message, cache=True)
+        self.app.call_on_main(self.app.say, message, cache=True)
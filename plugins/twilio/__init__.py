@@ -85,6 +85,7 @@ class TwilioPlugin(Plugin):
         self.check_sms(quiet=False, repeat=True)
 
     def check_sms(self, quiet=True, repeat=False):
+        # Fetched on the scheduler's worker, read out on the main loop
         messages = self.twilio.fetch_received()
         sentences = []
         for message in messages:
@@ -97,9 +98,9 @@ class TwilioPlugin(Plugin):
             sentences.append(message.body)
         if sentences:
             sentences.append("End of messages")
-            self.app.recite(sentences)
+            self.app.call_on_main(self.app.recite, sentences)
         elif not quiet:
-            self.app.say("No messages today")
+            self.app.call_on_main(self.app.say, "No messages today")
         self.last_checked = datetime.datetime.now()
 
 class Twilio(object):
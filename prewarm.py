@@ -0,0 +1,153 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Synthesizes the fixed prompts of the core and the plugins and every contact
+name into the phrase cache, so they are cache hits the first time they are
+said.
+
+Usage: python prewarm.py [workers]
+"""
+
+import ast
+import logging
+import os
+import sys
+
+from multiprocessing.pool import ThreadPool
+
+from synthesizer import split_blocks
+
+logger = logging.getLogger(__name__)
+
+
+def get_source_files(root):
+    """ Returns app.py, core.py and the modules of every plugin """
+    files = [os.path.join(root, "app.py"), os.path.join(root, "core.py")]
+    plugins = os.path.join(root, "plugins")
+    for plugin in sorted(os.listdir(plugins)):
+        file = os.path.join(plugins, plugin, "__init__.py")
+        if os.path.exists(file):
+            files.append(file)
+    return files
+
+
+def collect_prompts(files):
+    """ Returns the string literals passed as text to say() """
+    prompts = set()
+    for file in files:
+        with open(file) as f:
+            tree = ast.parse(f.read(), file)
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and node.args and
+                    isinstance(node.func, ast.Attribute) and
+                    node.func.attr == "say"):
+                continue
+            text = node.args[0]
+            # Format strings are only complete once they are filled in
+            if isinstance(text, ast.Str) and "%" not in text.s:
+                prompts.add(text.s)
+    return prompts
+
+
+def collect_names(addressbook, nicknames=None):
+    """ Returns the nicknames and full names of the contacts, of all of
+        them unless nicknames are given """
+    names = set()
+    if nicknames is None:
+        nicknames = addressbook.book.keys()
+    for nickname in nicknames:
+        names.add(nickname)
+        fullname = addressbook.get_fullname(nickname)
+        if fullname:
+            names.add(fullname)
+    return names
+
+
+def prewarm(synthesis, phrases, workers=2, stopped=None):
+    """ Synthesizes the phrases into the phrase cache in parallel and
+        returns how many were new, already cached or failed """
+    voices = [engine.voice for engine in synthesis.get_engines()]
+    counts = {"synthesized": 0, "cached": 0, "failed": 0}
+    # Cached the way say() looks them up
+    blocks = set()
+    for phrase in phrases:
+        blocks.update(split_blocks(phrase))
+    missing = []
+    for phrase in sorted(blocks):
+        if synthesis.phrase_cache.find(phrase, voices):
+            counts["cached"] += 1
+        else:
+            missing.append(phrase)
+
+    def synthesize(phrase):
+        if stopped is not None and stopped.is_set():
+            return None
+        return synthesis.synthesize(phrase, cache=True)
+
+    pool = ThreadPool(workers)
+    try:
+        for file_name in pool.imap_unordered(synthesize, missing):
+            counts["synthesized" if file_name else "failed"] += 1
+    finally:
+        pool.close()
+        pool.join()
+    return counts
+
+
+def main():
+    from config import config
+    from addressbook import AddressBook
+    from connectivity import ConnectivityMonitor
+    from phrasecache import PhraseCache
+    from synthesizer import (
+        LocalSynthesizer, RemoteSynthesizer, SynthesisPolicy)
+
+    logging.basicConfig(level=logging.INFO)
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    default_path = config.get("system")["default_path"]
+    data_path = os.path.join(default_path, config.get("system")["data_dir"])
+    phrase_cache = PhraseCache(
+        cache_dir=os.path.join(
+            data_path, config.get("system")["tts_cache_dir"]),
+        pinned_dir=os.path.join(default_path, "sound"),
+        max_bytes=config.get("system")["tts_cache_mb"] * 1024 * 1024)
+    phrase_cache.load()
+    synthesis = SynthesisPolicy(
+        phrase_cache=phrase_cache,
+        remote=RemoteSynthesizer(connectivity=ConnectivityMonitor()),
+        local=LocalSynthesizer(
+            command=config.get("audio")["tts_local_command"]),
+        prefer=config.get("audio")["tts_engine"])
+    addressbook = AddressBook(
+        user=config.get("user"), file=config.get("addressbook")["file"])
+
+    root = os.path.dirname(os.path.realpath(__file__))
+    phrases = collect_prompts(get_source_files(root))
+    phrases |= collect_names(addressbook)
+    counts = prewarm(synthesis, phrases, workers=workers)
+    print "Synthesized %(synthesized)d, already cached %(cached)d, " \
+        "failed %(failed)d" % counts
+
+
+if __name__ == "__main__":
+    main()
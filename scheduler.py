@@ -0,0 +1,152 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import heapq
+import logging
+import random
+
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+import libs
+
+
+class ScheduledTask(object):
+
+    def __init__(self, func, interval, jitter=0.0):
+        self.func = func
+        self.name = getattr(func, "__name__", str(func))
+        if hasattr(func, "im_class"):
+            self.name = func.im_class.__name__ + "." + self.name
+        self.interval = interval
+        self.jitter = jitter
+        self.due = None
+        self.next_run = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+
+    def get_stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "average_time": self.total_time / self.runs if self.runs else 0.0,
+            "max_time": self.max_time,
+            "last_time": self.last_time,
+            "running": self.running
+        }
+
+
+class Scheduler(object):
+    """ Runs periodic tasks on a bounded pool of worker threads
+
+        Due times live in a heap ordered by monotonic clock. A task that is
+        still running when it becomes due again is skipped for that round
+        rather than run twice at the same time. """
+
+    def __init__(self, max_workers=2, logger=None):
+        self.max_workers = max_workers
+        self.logger = logger or logging.getLogger(__name__)
+        self.tasks = []
+        self.queue = []
+        self.pool = None
+        self.lock = Lock()
+
+    def add(self, interval, func, jitter=0.0):
+        task = ScheduledTask(func, interval, jitter)
+        with self.lock:
+            self.tasks.append(task)
+            self._push(task, libs.monotonic() + interval)
+        return task
+
+    def get_timeout(self):
+        """ Seconds until the next task is due, None if nothing scheduled """
+        with self.lock:
+            if not self.queue:
+                return None
+            return max(0.0, self.queue[0][0] - libs.monotonic())
+
+    def run_pending(self, execute=True):
+        """ Hands every due task to the workers, or only reschedules them
+            if execute is False """
+        now = libs.monotonic()
+        ready = []
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                _, _, task = heapq.heappop(self.queue)
+                due = task.due + task.interval
+                if due <= now:
+                    # Don't burst to catch up with ticks missed while busy
+                    due = now + task.interval
+                self._push(task, due)
+                if not execute or task.running:
+                    task.skipped += 1
+                    continue
+                task.running = True
+                ready.append(task)
+        for task in ready:
+            self._get_pool().apply_async(self._run, (task,))
+
+    def get_stats(self):
+        with self.lock:
+            return dict((task.name, task.get_stats()) for task in self.tasks)
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.terminate()
+            self.pool = None
+
+    def _push(self, task, due):
+        task.due = due
+        task.next_run = due
+        if task.jitter:
+            task.next_run += random.uniform(0, task.jitter)
+        heapq.heappush(self.queue, (task.next_run, id(task), task))
+
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = ThreadPool(self.max_workers)
+        return self.pool
+
+    def _run(self, task):
+        start = libs.monotonic()
+        failed = False
+        try:
+            task.func()
+        except Exception, e:
+            failed = True
+            self.logger.exception(e)
+        elapsed = libs.monotonic() - start
+        with self.lock:
+            task.running = False
+            task.runs += 1
+            task.failures += failed
+            task.total_time += elapsed
+            task.max_time = max(task.max_time, elapsed)
+            task.last_time = elapsed
+        self.logger.debug("Task %s took %.3f sec" % (task.name, elapsed))
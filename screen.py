@@ -0,0 +1,171 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import errno
+import json
+import logging
+import os
+import socket
+
+from collections import deque
+
+SCREEN_SOCKET = "/tmp/psittaceous_screen.sock"
+# Large enough for a spoken line with its links
+MAX_MESSAGE_BYTES = 65536
+
+
+class ScreenClient(object):
+    """ Sends screen updates to the web server as JSON datagrams over a
+        Unix socket
+
+        Sending waits at most timeout_sec for the server to catch up. Updates
+        are dropped while the server is not listening, as they were when its
+        HTTP port was closed. """
+
+    def __init__(self, path=SCREEN_SOCKET, timeout_sec=0.1, logger=None):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.settimeout(timeout_sec)
+        self.dropped = 0
+
+    def update(self, html=None, css=None):
+        return self.send({"type": "update", "html": html, "css": css})
+
+    def send(self, message):
+        data = json.dumps(message)
+        if len(data) > MAX_MESSAGE_BYTES:
+            self.logger.info("Screen update too large: %d bytes" % len(data))
+            self.dropped += 1
+            return False
+        try:
+            self.sock.sendto(data, self.path)
+        except socket.error, e:
+            if e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+                self.logger.info("Screen update failed: %s" % e)
+            self.dropped += 1
+            return False
+        return True
+
+
+def bind_screen_socket(sock, path=SCREEN_SOCKET):
+    """ Binds the server end, replacing a socket left by a previous run """
+    if os.path.exists(path):
+        os.remove(path)
+    sock.bind(path)
+    return sock
+
+
+def parse_message(data):
+    """ Returns the message in a datagram or None if it is malformed """
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or "type" not in message:
+        return None
+    return message
+
+
+def parse_css(css):
+    """ Returns css as a dict. The /update/ route receives it as the repr of
+        a dict. """
+    if isinstance(css, dict):
+        return css
+    try:
+        css = json.loads(css.replace("'", '"'))
+    except (AttributeError, ValueError):
+        return {}
+    return css if isinstance(css, dict) else {}
+
+
+class ScreenState(object):
+    """ What the screen shows: the body CSS, the latest output lines and the
+        page opened with its back and forward history
+
+        Changes are collected until get_delta, so several updates in a row
+        go out as one message and a CSS value set back before it was sent
+        is not sent at all. """
+
+    def __init__(self, max_lines=50, max_history=20):
+        self.css = {}
+        self.lines = deque(maxlen=max_lines)
+        self.page = None
+        self.back = deque(maxlen=max_history)
+        self.forward = []
+        # Changes not yet in a delta
+        self.sent_css = {}
+        self.new_lines = []
+        self.page_changed = False
+
+    def apply(self, html=None, css=None):
+        if css:
+            self.css.update(parse_css(css))
+        if not html or html == "None":
+            return
+        if html == "<back>":
+            if self.back:
+                self.forward.append(self.page)
+                self._open(self.back.pop())
+        elif html == "<forward>":
+            if self.forward:
+                self.back.append(self.page)
+                self._open(self.forward.pop())
+        elif html.startswith("http"):
+            if self.page:
+                self.back.append(self.page)
+            self.forward = []
+            self._open(html)
+        else:
+            self.lines.append(html)
+            self.new_lines.append(html)
+
+    def get_delta(self):
+        """ Returns a message with the changes since the last call or None
+            if nothing changed """
+        message = {}
+        css = dict(
+            (key, value) for key, value in self.css.items()
+            if self.sent_css.get(key) != value)
+        if css:
+            message["css"] = css
+            self.sent_css.update(css)
+        if self.new_lines:
+            message["lines"] = self.new_lines
+            self.new_lines = []
+        if self.page_changed:
+            message["page"] = self.page
+            self.page_changed = False
+        return message or None
+
+    def get_snapshot(self):
+        """ Returns a message that brings a new client up to date """
+        return {
+            "snapshot": True,
+            "css": dict(self.css),
+            "lines": list(self.lines),
+            "page": self.page
+        }
+
+    def _open(self, page):
+        self.page = page
+        self.page_changed = True
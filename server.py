@@ -22,6 +22,11 @@
 
 # coding: utf-8
 
+import gevent
+
+from collections import deque
+from gevent import socket as gsocket
+from gevent.event import Event
 from gevent.pywsgi import WSGIServer
 from geventwebsocket import WebSocketError
 from geventwebsocket.handler import WebSocketHandler
@@ -31,8 +36,12 @@ from config import config
 import json
 import os
 import socket
+import time
 
 from libs.decorators import jsonp
+from screen import (
+    bind_screen_socket, MAX_MESSAGE_BYTES, parse_message, SCREEN_SOCKET,
+    ScreenState)
 
 
 s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -56,7 +65,13 @@ class WebServer(Flask):
         self.host = host
         self.port = port
         self.template_folder = template
-        self.sockets = set()
+        self.clients = set()
+        self.max_clients = config.get("system")["screen_max_clients"]
+        self.client_queue_size = config.get("system")["screen_queue_size"]
+        self.heartbeat_sec = config.get("system")["screen_heartbeat_sec"]
+        self.coalesce_sec = config.get("system")["screen_coalesce_ms"] / 1000.0
+        self.state = ScreenState()
+        self.flush_scheduled = False
         self.config = config
         self.nickname = config.get("computer_nickname")
 
@@ -74,65 +89,139 @@ class WebServer(Flask):
 
     def start(self, message_queue):
         self.message_queue = message_queue
+        gevent.spawn(self.receive_updates)
+        gevent.spawn(self.send_heartbeats)
         print("Server started at %s:%s" % (self.host, self.port))
         self.http_server.serve_forever()
 
+    def receive_updates(self, path=SCREEN_SOCKET):
+        """ Applies the updates the app sends over the screen socket """
+        sock = bind_screen_socket(
+            gsocket.socket(socket.AF_UNIX, socket.SOCK_DGRAM), path)
+        while True:
+            message = parse_message(sock.recv(MAX_MESSAGE_BYTES))
+            if message and message["type"] == "update":
+                self.update_screen(
+                    html=message.get("html"), css=message.get("css"))
+
     def wsgi_app(self, environ, start_response):
         path = environ["PATH_INFO"]
         if path == "/websocket":
-            return self.handle_websocket(environ["wsgi.websocket"])
+            self.handle_websocket(environ["wsgi.websocket"])
+            # The websocket handler iterates over what the app returns
+            return []
 
         return self.flask(environ, start_response)
 
     def handle_websocket(self, ws):
-        erase_list = []
-#        for socket in self.sockets:
-#            if (not hasattr(socket, "socket") or
-#                not socket.socket):  # Dead socket
-#                erase_list.append(socket)
-        for socket in erase_list:
-            self.sockets.remove(socket)
-
-        if not ws in self.sockets:
-            if len(self.sockets) > 10:
-                self.exceeded_max_connection(ws)
-            else:
-                self.sockets.add(ws)
-
-        while True:
-            message = ws.receive()
-            if message is None:
-                break
-            message = json.loads(message)
-            self.message_queue.put(message["output"])
-            erase_list = []
-            for socket in self.sockets:
-#                if (not hasattr(socket, "socket") or
-#                    not socket.socket):  # Dead socket
-#                    erase_list.append(socket)
-#                    continue
-                socket.send(json.dumps({"output": message["output"]}))
-            for socket in erase_list:
-                self.sockets.remove(socket)
+        if len(self.clients) >= self.max_clients:
+            self.exceeded_max_connection(ws)
+            return
+        client = WebClient(ws, max_queue=self.client_queue_size)
+        # Send what is pending to the others first, so the snapshot is not
+        # followed by a delta with the same changes
+        self.flush_screen()
+        client.send(json.dumps(self.state.get_snapshot()))
+        self.clients.add(client)
+        try:
+            while not client.closed:
+                try:
+                    message = ws.receive()
+                except (WebSocketError, socket.error):
+                    break
+                if message is None:
+                    break
+                client.last_seen = time.time()
+                message = json.loads(message)
+                if "output" not in message:  # Heartbeat reply
+                    continue
+                # As Application.post_message, from this process
+                self.message_queue.put((message["output"], None))
+                self.update_screen(html=message["output"])
+        finally:
+            self.clients.discard(client)
+            client.close()
 
     def exceeded_max_connection(self, ws):
-        ws.send(json.dumps({"output": "Sorry, max connection reached."}))
+        ws.send(json.dumps({"lines": ["Sorry, max connection reached."]}))
+
+    def broadcast(self, message):
+        """ Queues the message for every client without waiting for any """
+        data = json.dumps(message)
+        for client in list(self.clients):
+            client.send(data)
 
     def update_screen(self, html=None, css=None):
-        erase_list = []
-        for socket in self.sockets:
-#            if (not hasattr(socket, "socket") or
-#                not socket.socket):  # Dead socket
-#                erase_list.append(socket)
-            try:
-                socket.send(json.dumps({"output": html, "css": css}))
-            except WebSocketError:
-                erase_list.append(socket)
-        for socket in erase_list:
-            try:
-                self.sockets.remove(socket)
-            except KeyError:
-                pass
+        self.state.apply(html=html, css=css)
+        if self.flush_scheduled:
+            return
+        self.flush_scheduled = True
+        gevent.spawn_later(self.coalesce_sec, self.flush_screen)
+
+    def flush_screen(self):
+        """ Sends the screen changes collected since the last flush """
+        self.flush_scheduled = False
+        message = self.state.get_delta()
+        if message:
+            self.broadcast(message)
+
+    def send_heartbeats(self):
+        """ Pings every client and closes the ones that stopped answering """
+        ping = json.dumps({"ping": True})
+        while True:
+            gevent.sleep(self.heartbeat_sec)
+            deadline = time.time() - 3 * self.heartbeat_sec
+            for client in list(self.clients):
+                if client.last_seen < deadline:
+                    self.clients.discard(client)
+                    client.close()
+                else:
+                    client.send(ping)
+
+
+class WebClient(object):
+    """ A websocket with its own bounded send queue, drained by its own
+        greenlet so a slow client only delays itself
+
+        When the queue is full the oldest message is dropped. """
+
+    def __init__(self, ws, max_queue=64):
+        self.ws = ws
+        self.queue = deque(maxlen=max_queue)
+        self.ready = Event()
+        self.closed = False
+        self.dropped = 0
+        self.last_seen = time.time()
+        self.writer = gevent.spawn(self._write)
+
+    def send(self, data):
+        if self.closed:
+            return
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(data)
+        self.ready.set()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.ready.set()
+        try:
+            self.ws.close()
+        except (WebSocketError, socket.error):
+            pass
+
+    def _write(self):
+        while not self.closed:
+            self.ready.wait()
+            self.ready.clear()
+            while self.queue and not self.closed:
+                try:
+                    self.ws.send(self.queue.popleft())
+                except (WebSocketError, socket.error):
+                    self.close()
 
 
 server = WebServer()
@@ -157,9 +246,8 @@ def index():
 def update():
     html = request.form["html"] or None
     css = request.form["css"] or None
-    print html
     server.update_screen(html=html, css=css)
-    return render_template("index.html", port=server.port)
+    return jsonify(status="ok")
 
 
 def start_server(message_queue):
@@ -0,0 +1,245 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import httplib
+import itertools
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import urllib
+import urllib2
+
+from distutils.spawn import find_executable
+from threading import Lock
+
+TTS_URL = "http://translate.google.com/translate_tts"
+# Words synthesized at a time, short enough for the remote engine
+BLOCK_WORDS = 10
+
+
+def split_blocks(text):
+    """ Splits text into the blocks say() synthesizes one by one """
+    words = text.split(" ")
+    blocks = [
+        " ".join(words[index:index + BLOCK_WORDS])
+        for index in range(0, len(words), BLOCK_WORDS)]
+    return [block for block in blocks if block.strip()]
+
+
+class Synthesizer(object):
+    """ Turns text into audio a player can open
+
+        Subclasses implement synthesize(text, f), writing the audio of the
+        text into the file object f. voice tells apart the audio of
+        different engines and settings in the phrase cache, ext is the file
+        extension of what is written. """
+
+    name = None
+    voice = None
+    ext = None
+
+    def is_available(self):
+        return True
+
+
+class RemoteSynthesizer(Synthesizer):
+    """ Google Translate text to speech, only as available as the internet
+        connection the monitor reports """
+
+    name = "remote"
+    ext = ".mp3"
+
+    def __init__(self, connectivity=None, language="en", timeout_sec=10):
+        self.connectivity = connectivity
+        self.language = language
+        # Cache key the phrases downloaded before engines were pluggable
+        self.voice = language
+        self.timeout_sec = timeout_sec
+
+    def is_available(self):
+        return self.connectivity is None or self.connectivity.is_up
+
+    def synthesize(self, text, f):
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
+        param = urllib.urlencode({"tl": self.language, "q": text})
+        user_agent = "Mozilla/4.0 (compatible; MSIE 5.5; Windows NT)"
+        req = urllib2.Request(
+            url=TTS_URL + "?" + param, headers={"User-Agent": user_agent})
+        try:
+            client = urllib2.urlopen(req, timeout=self.timeout_sec)
+            shutil.copyfileobj(client, f)
+        except (IOError, httplib.HTTPException, urllib2.URLError):
+            if self.connectivity is not None:
+                self.connectivity.report_failure()
+            raise
+
+
+class LocalSynthesizer(Synthesizer):
+    """ espeak, espeak-ng or pico2wave on this machine, writing WAV """
+
+    name = "local"
+    ext = ".wav"
+
+    def __init__(self, command="espeak", language="en"):
+        self.command = command
+        self.language = language
+        self.voice = "%s:%s" % (os.path.basename(command), language)
+        # Looked up once rather than searching PATH for every phrase
+        self.installed = find_executable(command) is not None
+
+    def is_available(self):
+        return self.installed
+
+    def synthesize(self, text, f):
+        if isinstance(text, unicode):
+            text = text.encode("utf-8")
+        if os.path.basename(self.command) == "pico2wave":
+            return self._pico2wave(text, f)
+        proc = subprocess.Popen(
+            [self.command, "-v", self.language, "--stdout", "--", text],
+            stdout=subprocess.PIPE)
+        shutil.copyfileobj(proc.stdout, f)
+        if proc.wait() != 0:
+            raise IOError("%s exited with %d" % (
+                self.command, proc.returncode))
+
+    def _pico2wave(self, text, f):
+        # pico2wave only writes to a named .wav file
+        fd, wav_file = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            language = "en-US" if self.language == "en" else self.language
+            code = subprocess.call(
+                [self.command, "-l", language, "-w", wav_file, text])
+            if code != 0:
+                raise IOError("%s exited with %d" % (self.command, code))
+            with open(wav_file, "rb") as wav:
+                shutil.copyfileobj(wav, f)
+        finally:
+            os.remove(wav_file)
+
+
+class SynthesisPolicy(object):
+    """ Picks the engine for each phrase and returns a file to play
+
+        A phrase cached by any engine is played from the cache. Otherwise
+        the remote engine is used while it is up and answers within
+        max_latency_sec, and the local one when it is not. A slow remote
+        engine is given another chance every retry_sec. Phrases said with
+        cache=True are kept in the phrase cache, others are written to
+        rotating scratch files. """
+
+    def __init__(self, phrase_cache, remote=None, local=None, prefer="auto",
+                 max_latency_sec=1.5, retry_sec=60,
+                 scratch_file="/tmp/speech%d", scratch_slots=8, logger=None):
+        self.phrase_cache = phrase_cache
+        self.remote = remote
+        self.local = local
+        self.prefer = prefer
+        self.max_latency_sec = max_latency_sec
+        self.retry_sec = retry_sec
+        self.scratch_file = scratch_file
+        # More than can be queued, synthesizing and playing at once
+        self.scratch_slots = itertools.cycle(range(scratch_slots))
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock = Lock()
+        self.latency = {}
+        self.last_tried = {}
+        self.stats = {}
+
+    def get_engines(self):
+        return [engine for engine in (self.remote, self.local) if engine]
+
+    def choose(self, cache=False):
+        """ Returns the engines to try, best first """
+        engines = [
+            engine for engine in self.get_engines() if engine.is_available()]
+        if len(engines) < 2:
+            return engines
+        if self.prefer == "local":
+            return [self.local, self.remote]
+        if self.prefer == "remote" or cache:
+            # Fetched once and kept, so quality wins over latency
+            return [self.remote, self.local]
+        with self.lock:
+            latency = self.latency.get(self.remote.name, 0.0)
+            last_tried = self.last_tried.get(self.remote.name, 0.0)
+        if (latency > self.max_latency_sec and
+                time.time() - last_tried < self.retry_sec):
+            return [self.local, self.remote]
+        return [self.remote, self.local]
+
+    def synthesize(self, text, cache=False):
+        """ Returns the file to play for the text or None """
+        file_name = self.phrase_cache.find(
+            text, [engine.voice for engine in self.get_engines()])
+        if file_name:
+            return file_name
+        for engine in self.choose(cache=cache):
+            start = time.time()
+            try:
+                if cache:
+                    file_name = self.phrase_cache.put(
+                        text, lambda f: engine.synthesize(text, f),
+                        voice=engine.voice, ext=engine.ext)
+                else:
+                    file_name = (
+                        self.scratch_file % next(self.scratch_slots) +
+                        engine.ext)
+                    with open(file_name, "wb") as f:
+                        engine.synthesize(text, f)
+            except (IOError, OSError, httplib.HTTPException,
+                    urllib2.URLError), e:
+                self.logger.error(
+                    "Could not synthesize speech with %s: %s"
+                    % (engine.name, e))
+                # Counted as slow as its timeout, so an engine that keeps
+                # failing is tried last
+                elapsed = max(
+                    time.time() - start, getattr(engine, "timeout_sec", 0.0))
+                self._record(engine, elapsed, failed=True)
+                continue
+            self._record(engine, time.time() - start)
+            return file_name
+        return None
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(
+                (name, dict(counts)) for name, counts in self.stats.items())
+            for name, latency in self.latency.items():
+                stats.setdefault(name, {})["latency_sec"] = latency
+        return stats
+
+    def _record(self, engine, elapsed, failed=False):
+        with self.lock:
+            counts = self.stats.setdefault(
+                engine.name, {"phrases": 0, "failures": 0})
+            self.last_tried[engine.name] = time.time()
+            counts["failures" if failed else "phrases"] += 1
+            prev = self.latency.get(engine.name)
+            self.latency[engine.name] = (
+                elapsed if prev is None else 0.8 * prev + 0.2 * elapsed)
@@ -0,0 +1,196 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from collections import deque
+from threading import Lock
+
+import libs
+
+from decoder import HYPOTHESIS, SPEECH_END, SPEECH_START
+
+# Upper bounds of histogram buckets in seconds. The last one catches all.
+LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def get_percentile(self, percent):
+        """ Upper bound of the bucket the percentile falls in """
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "average": self.total / self.count if self.count else None,
+            "max": self.max,
+            "p50": self.get_percentile(50),
+            "p90": self.get_percentile(90)
+        }
+
+
+class UtteranceRecord(object):
+
+    __slots__ = (
+        "utterance_id", "text", "speech_start", "speech_end", "hypothesis",
+        "dispatch")
+
+    def __init__(self, utterance_id):
+        self.utterance_id = utterance_id
+        self.text = None
+        self.speech_start = None
+        self.speech_end = None
+        self.hypothesis = None
+        self.dispatch = None
+
+    def get_latencies(self):
+        """ Seconds from speech end to hypothesis, hypothesis to dispatch,
+            and speech end to dispatch. None where a step is missing """
+        return {
+            "decode": _elapsed(self.speech_end, self.hypothesis),
+            "dispatch": _elapsed(self.hypothesis, self.dispatch),
+            "total": _elapsed(self.speech_end, self.dispatch)
+        }
+
+    def to_dict(self):
+        record = dict((key, getattr(self, key)) for key in self.__slots__)
+        for name, latency in self.get_latencies().items():
+            record[name + "_latency"] = latency
+        return record
+
+
+class LatencyTracker(object):
+    """ Follows each utterance from the decoder's events to the dispatch of
+        its text, and keeps latency histograms over all of them """
+
+    def __init__(self, history=100):
+        self.records = deque(maxlen=history)
+        self.by_id = {}
+        # Utterances put on the message queue, waiting to be dispatched
+        self.pending = set()
+        self.histograms = {
+            "decode": Histogram(),
+            "dispatch": Histogram(),
+            "total": Histogram()
+        }
+        self.lock = Lock()
+
+    def add_event(self, event):
+        with self.lock:
+            record = self.by_id.get(event.utterance_id)
+            if record is None:
+                if len(self.records) == self.records.maxlen:
+                    del self.by_id[self.records[0].utterance_id]
+                record = UtteranceRecord(event.utterance_id)
+                self.records.append(record)
+                self.by_id[event.utterance_id] = record
+            if event.kind == SPEECH_START:
+                record.speech_start = event.timestamp
+            elif event.kind == SPEECH_END:
+                record.speech_end = event.timestamp
+            elif event.kind == HYPOTHESIS:
+                record.hypothesis = event.timestamp
+                record.text = event.text
+                latency = record.get_latencies()["decode"]
+                if latency is not None:
+                    self.histograms["decode"].add(latency)
+
+    def expect_dispatch(self, utterance_id):
+        """ Marks the utterance as put on the message queue """
+        with self.lock:
+            if len(self.pending) >= self.records.maxlen:
+                self.pending = set(
+                    pending_id for pending_id in self.pending
+                    if pending_id in self.by_id)
+            self.pending.add(utterance_id)
+
+    def dispatched(self, utterance_id, timestamp=None):
+        with self.lock:
+            if utterance_id not in self.pending:
+                return
+            self.pending.discard(utterance_id)
+            record = self.by_id.get(utterance_id)
+            if record is None:
+                return
+            record.dispatch = timestamp or libs.monotonic()
+            latencies = record.get_latencies()
+            for name in ("dispatch", "total"):
+                if latencies[name] is not None:
+                    self.histograms[name].add(latencies[name])
+
+    def get_record(self, utterance_id):
+        with self.lock:
+            record = self.by_id.get(utterance_id)
+            return record.to_dict() if record else None
+
+    def get_records(self):
+        with self.lock:
+            return [record.to_dict() for record in self.records]
+
+    def get_histograms(self):
+        with self.lock:
+            return dict(
+                (name, histogram.to_dict())
+                for name, histogram in self.histograms.items())
+
+    def format_histograms(self):
+        lines = []
+        for name, histogram in sorted(self.get_histograms().items()):
+            if not histogram["count"]:
+                continue
+            lines.append(
+                "%s latency: n=%d avg=%.3fs p50<=%.3fs p90<=%.3fs max=%.3fs"
+                % (name, histogram["count"], histogram["average"],
+                   histogram["p50"], histogram["p90"], histogram["max"]))
+        return lines
+
+
+def _elapsed(start, end):
+    if start is None or end is None:
+        return None
+    return end - start
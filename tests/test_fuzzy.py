@@ -0,0 +1,143 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Unit tests for the fuzzy name matching
+
+Usage: python -m unittest discover
+"""
+
+import random
+import unittest
+
+from libs.fuzzy import BKTree, NameIndex, levenshtein, metaphone
+
+
+def levenshtein_table(a, b):
+    """ The textbook dynamic programming distance to check against """
+    row = range(len(b) + 1)
+    for i, ca in enumerate(a):
+        previous, row = row, [i + 1]
+        for j, cb in enumerate(b):
+            row.append(min(
+                previous[j + 1] + 1, row[j] + 1, previous[j] + (ca != cb)))
+    return row[-1]
+
+
+class LevenshteinTest(unittest.TestCase):
+
+    def test_examples(self):
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertEqual(levenshtein("abc", ""), 3)
+        self.assertEqual(levenshtein("john", "john"), 0)
+
+    def test_matches_table(self):
+        rand = random.Random(0)
+        for i in range(500):
+            a = "".join(
+                rand.choice("abcd") for j in range(rand.randint(0, 12)))
+            b = "".join(
+                rand.choice("abcd") for j in range(rand.randint(0, 12)))
+            self.assertEqual(
+                levenshtein(a, b), levenshtein_table(a, b), (a, b))
+
+    def test_long_words(self):
+        # Longer than a machine word, so the bits carry across it
+        a = "abcdefghij" * 8
+        b = "abcdefxhij" * 8 + "k"
+        self.assertEqual(levenshtein(a, b), levenshtein_table(a, b))
+
+
+class MetaphoneTest(unittest.TestCase):
+
+    def test_sounds_alike(self):
+        self.assertEqual(metaphone("jon"), metaphone("john"))
+        self.assertEqual(metaphone("catherine"), metaphone("katherine"))
+        self.assertEqual(metaphone("philip"), metaphone("filip"))
+
+    def test_sounds_different(self):
+        self.assertNotEqual(metaphone("john"), metaphone("mary"))
+
+    def test_ignores_case_and_punctuation(self):
+        self.assertEqual(metaphone("O'Neil"), metaphone("oneil"))
+
+
+class BKTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.words = ["john", "jon", "joan", "mary", "marie", "bob", "rob"]
+        self.tree = BKTree(self.words)
+
+    def test_search_matches_scan(self):
+        for word in ["jhon", "mari", "bobby", "x"]:
+            for max_distance in range(4):
+                expected = sorted(
+                    (levenshtein(word, w), w) for w in self.words
+                    if levenshtein(word, w) <= max_distance)
+                self.assertEqual(
+                    self.tree.search(word, max_distance), expected)
+
+    def test_duplicates(self):
+        self.tree.add("john")
+        self.assertEqual(len(self.tree), len(self.words))
+
+    def test_remove(self):
+        self.tree.remove("jon")
+        self.assertEqual(len(self.tree), len(self.words) - 1)
+        found = [word for d, word in self.tree.search("jon", 1)]
+        self.assertEqual(found, ["joan", "john"])
+        self.tree.add("jon")
+        self.assertEqual(self.tree.search("jon", 0), [(0, "jon")])
+
+    def test_empty(self):
+        self.assertEqual(BKTree().search("john", 2), [])
+
+
+class NameIndexTest(unittest.TestCase):
+
+    def test_exact(self):
+        index = NameIndex(["john", "mary"])
+        self.assertEqual(index.get_best("john"), ("john", 1.0, False))
+
+    def test_misheard(self):
+        index = NameIndex(["john", "mary"])
+        name, confidence, ambiguous = index.get_best("jon")
+        self.assertEqual(name, "john")
+        self.assertTrue(0.0 < confidence < 1.0)
+        self.assertFalse(ambiguous)
+
+    def test_ambiguous(self):
+        # One edit from either
+        index = NameIndex(["jon", "jan"])
+        self.assertTrue(index.get_best("jen")[2])
+
+    def test_update(self):
+        index = NameIndex(["john"])
+        index.update(added=["mary"], removed=["john"])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.get_best("john")[0], None)
+        self.assertEqual(index.get_best("mary")[0], "mary")
+
+
+if __name__ == "__main__":
+    unittest.main()
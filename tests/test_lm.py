@@ -0,0 +1,152 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Unit tests for the language model builder
+
+Usage: python -m unittest discover
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.lm import (
+    START, BackoffModel, build_model, count_ngrams, guess_pronunciation,
+    is_built, tokenize)
+
+CORPUS = [
+    "call john",
+    "call john back",
+    "call mary",
+    "text mary",
+    "what time is it",
+    "what is the weather",
+]
+
+
+class BackoffModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.counts = count_ngrams(CORPUS, order=3)
+        self.model = BackoffModel(self.counts)
+        self.vocab = [
+            gram[0] for gram in self.counts[0] if gram[0] != START]
+
+    def assertSumsToOne(self, history):
+        total = sum(
+            self.model.get_prob(history + (word,)) for word in self.vocab)
+        self.assertAlmostEqual(total, 1.0, places=6, msg=history)
+
+    def test_unigrams_sum_to_one(self):
+        self.assertSumsToOne(())
+
+    def test_seen_histories_sum_to_one(self):
+        for n in (2, 3):
+            for gram in self.counts[n - 1]:
+                self.assertSumsToOne(gram[:-1])
+
+    def test_unseen_histories_sum_to_one(self):
+        self.assertSumsToOne(("MARY",))
+        self.assertSumsToOne(("TEXT", "JOHN"))
+
+    def test_backs_off(self):
+        # Never seen after TEXT, but seen after CALL
+        self.assertTrue(self.model.get_prob(("TEXT", "JOHN")) > 0.0)
+        self.assertTrue(
+            self.model.get_prob(("CALL", "JOHN")) >
+            self.model.get_prob(("TEXT", "JOHN")))
+
+    def test_never_starts(self):
+        self.assertEqual(self.model.get_prob((START,)), 0.0)
+        self.assertEqual(self.model.get_prob(("NOBODY",)), 0.0)
+
+    def test_arpa_counts(self):
+        lines = []
+
+        class Output(object):
+            def write(self, data):
+                lines.extend(data.splitlines())
+
+        self.model.write_arpa(Output())
+        for n in (1, 2, 3):
+            self.assertTrue(
+                "ngram %d=%d" % (n, len(self.counts[n - 1])) in lines)
+        self.assertEqual(lines[-1], "\\end\\")
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize(u"Call O'Neil, now!"), [u"CALL", u"O'NEIL", u"NOW"])
+        self.assertEqual(tokenize(u"-- ..."), [])
+
+
+class GuessPronunciationTest(unittest.TestCase):
+
+    def test_guess(self):
+        self.assertEqual(guess_pronunciation("call"), "K AE L")
+        self.assertEqual(guess_pronunciation("night"), "N AY T")
+        self.assertEqual(guess_pronunciation("kate"), "K AE T")
+        self.assertEqual(guess_pronunciation("42"), "F AO R T UW")
+
+
+class BuildModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.corpus_file = os.path.join(self.dir, "corpus.txt")
+        self.dict_file = os.path.join(self.dir, "corpus.dic")
+        self.lm_file = os.path.join(self.dir, "corpus.lm")
+        # Guess every pronunciation, whatever is installed
+        self.base_dict_file = os.path.join(self.dir, "none.dic")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def build(self, lines):
+        with open(self.corpus_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return build_model(
+            self.corpus_file, self.dict_file, self.lm_file,
+            base_dict_file=self.base_dict_file)
+
+    def test_build_once(self):
+        self.assertTrue(self.build(CORPUS))
+        self.assertTrue(is_built(
+            self.corpus_file, self.dict_file, self.lm_file,
+            base_dict_file=self.base_dict_file))
+        self.assertFalse(self.build(CORPUS))
+        with open(self.dict_file) as f:
+            self.assertTrue("CALL\tK AE L\n" in f.readlines())
+        self.assertTrue(self.build(CORPUS + ["call bob"]))
+
+    def test_empty_corpus(self):
+        self.assertRaises(ValueError, self.build, ["", "..."])
+        self.assertFalse(os.path.exists(self.lm_file))
+        self.assertFalse(os.path.exists(self.lm_file + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
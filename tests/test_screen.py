@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Unit tests for the screen state sent to the web clients
+
+Usage: python -m unittest discover
+"""
+
+import unittest
+
+from screen import ScreenState
+
+
+class GetDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state = ScreenState()
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.state.get_delta(), None)
+        self.state.apply(html="None")
+        self.assertEqual(self.state.get_delta(), None)
+
+    def test_lines_batched(self):
+        self.state.apply(html="one")
+        self.state.apply(html="two")
+        self.assertEqual(self.state.get_delta(), {"lines": ["one", "two"]})
+        self.assertEqual(self.state.get_delta(), None)
+
+    def test_css_latest_value(self):
+        self.state.apply(css={"background": "red"})
+        self.state.apply(css="{'background': 'blue', 'color': 'white'}")
+        self.assertEqual(
+            self.state.get_delta(),
+            {"css": {"background": "blue", "color": "white"}})
+
+    def test_css_set_back_not_sent(self):
+        self.state.apply(css={"background": "red"})
+        self.state.get_delta()
+        self.state.apply(css={"background": "blue"})
+        self.state.apply(css={"background": "red"})
+        self.assertEqual(self.state.get_delta(), None)
+
+    def test_page_history(self):
+        self.state.apply(html="http://a")
+        self.assertEqual(self.state.get_delta(), {"page": "http://a"})
+        self.state.apply(html="http://b")
+        self.state.apply(html="<back>")
+        self.assertEqual(self.state.get_delta(), {"page": "http://a"})
+        self.state.apply(html="<forward>")
+        self.assertEqual(self.state.get_delta(), {"page": "http://b"})
+        self.state.apply(html="<forward>")
+        self.assertEqual(self.state.get_delta(), None)
+
+    def test_snapshot_keeps_delta(self):
+        self.state.apply(html="one", css={"color": "white"})
+        snapshot = self.state.get_snapshot()
+        self.assertEqual(snapshot["lines"], ["one"])
+        self.assertEqual(
+            self.state.get_delta(),
+            {"css": {"color": "white"}, "lines": ["one"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Unit tests for the word trie
+
+Usage: python -m unittest discover
+"""
+
+import unittest
+
+from libs.trie import WordTrie
+
+
+class WordTrieTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = WordTrie()
+        self.trie.add("call", 1)
+        self.trie.add("call back", 2)
+        self.trie.add("what time is it", 3)
+
+    def test_get(self):
+        self.assertEqual(self.trie.get("call"), 1)
+        self.assertEqual(self.trie.get("call  back"), 2)
+        self.assertEqual(self.trie.get("what time"), None)
+        self.assertEqual(self.trie.get("text", "none"), "none")
+
+    def test_contains(self):
+        self.assertTrue("call back" in self.trie)
+        self.assertFalse("what time" in self.trie)
+        self.assertFalse("" in self.trie)
+
+    def test_len(self):
+        self.assertEqual(len(self.trie), 3)
+        self.trie.add("call", 4)
+        self.assertEqual(len(self.trie), 3)
+        self.assertEqual(self.trie.get("call"), 4)
+
+    def test_longest_prefix(self):
+        self.assertEqual(
+            self.trie.longest_prefix("call back john"),
+            ("call back", 2, "john"))
+        self.assertEqual(
+            self.trie.longest_prefix("call bob"), ("call", 1, "bob"))
+        self.assertEqual(
+            self.trie.longest_prefix("what time is it"),
+            ("what time is it", 3, ""))
+
+    def test_whole_words(self):
+        self.assertEqual(self.trie.longest_prefix("caller john"), None)
+        self.assertEqual(self.trie.longest_prefix("what time was it"), None)
+        self.assertEqual(self.trie.longest_prefix(""), None)
+
+    def test_empty_phrase(self):
+        self.assertRaises(ValueError, self.trie.add, "  ", 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
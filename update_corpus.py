@@ -1,27 +1,23 @@
-import re
-import requests
 import sys
 
-if len(sys.argv) < 3:
-    print (
-        "Usage: python update_corpus.py input_corpus_file " +
-        "output_dict_file output_lm_file")
-    sys.exit(1)
-
-url = "http://www.speech.cs.cmu.edu/cgi-bin/tools/lmtool/run"
-files = {"corpus": open(sys.argv[1], "rb")}
-r = requests.post(url, files=files, data={"formtype": "simple"})
+from optparse import OptionParser
 
-m = re.search(r"\d{4}.dic", r.content)
-dic_file = m.group(0)
+from libs.lm import build_model
 
-r_dic = requests.get(r.url + dic_file)
-with open(sys.argv[2], "w") as f:
-    f.write(r_dic.content)
-
-lm_file = dic_file.replace("dic", "lm")
-r_lm = requests.get(r.url + lm_file)
-with open(sys.argv[3], "w") as f:
-    f.write(r_lm.content)
+parser = OptionParser(
+    usage="python update_corpus.py input_corpus_file " +
+    "output_dict_file output_lm_file")
+parser.add_option("--base-dict", default="", help="CMU dictionary to use")
+parser.add_option("--order", type="int", default=3)
+parser.add_option("--workers", type="int", default=1)
+options, args = parser.parse_args()
+if len(args) < 3:
+    parser.print_usage()
+    sys.exit(1)
 
-print "Updated corpus"
+if build_model(
+        args[0], args[1], args[2], base_dict_file=options.base_dict,
+        order=options.order, workers=options.workers):
+    print "Updated corpus"
+else:
+    print "Corpus unchanged"
@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2013 Daigo Tanaka (@daigotanaka)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import math
+import numpy
+
+# What EnergyVad.process returns when an utterance starts or ends
+SPEECH_STARTED = "started"
+SPEECH_ENDED = "ended"
+
+
+def to_dbfs(rms):
+    # Floored at the quietest level 16 bit samples can hold
+    return 20 * math.log10(max(rms, 1 / 32768.0))
+
+
+class NoiseFloor(object):
+    """ Running estimate of the background level
+
+        Follows quiet frames down quickly and loud frames up slowly, so
+        speech barely moves it while a fan switched on is picked up within
+        seconds. """
+
+    def __init__(self, fall=0.1, rise=0.001):
+        self.fall = fall
+        self.rise = rise
+        self.level = None
+
+    def update(self, rms):
+        if self.level is None:
+            self.level = rms
+        elif rms < self.level:
+            self.level += self.fall * (rms - self.level)
+        else:
+            self.level += self.rise * (rms - self.level)
+        return self.level
+
+
+class EnergyVad(object):
+    """ Finds utterances in 16 bit PCM chunks by the energy of short frames
+
+        A frame is speech when its RMS is speech_ratio times above the noise
+        floor. An utterance starts once a chunk has onset_sec of speech
+        frames and ends after hangover_sec of silence, counted in frames so
+        it does not depend on the chunk size. Levels are RMS with full scale
+        at 1.0. """
+
+    def __init__(self, sample_rate=16000, frame_sec=0.01, speech_ratio=3.0,
+                 min_rms=0.005, hangover_sec=0.6, onset_sec=0.03):
+        self.frame_samples = int(sample_rate * frame_sec)
+        self.frame_sec = frame_sec
+        self.speech_ratio = speech_ratio
+        self.min_rms = min_rms
+        self.hangover_sec = hangover_sec
+        self.onset_sec = onset_sec
+        self.noise = NoiseFloor()
+        self.in_speech = False
+        self.silence_sec = 0.0
+        # Latest chunk, and frames classified as speech in the utterance
+        self.current_rms = 0.0
+        self.speech_rms = 0.0
+        self.speech_frames = 0
+        self.speech_energy = 0.0
+        self.utterances = 0
+
+    @property
+    def noise_rms(self):
+        return self.noise.level or 0.0
+
+    def process(self, chunk):
+        """ Takes a NumPy array of samples and returns SPEECH_STARTED,
+            SPEECH_ENDED or None """
+        count = len(chunk) // self.frame_samples
+        if not count:
+            return None
+        frames = chunk[:count * self.frame_samples].reshape(
+            count, self.frame_samples) / 32768.0
+        rms = numpy.sqrt(numpy.mean(frames * frames, axis=1))
+        self.current_rms = float(numpy.sqrt(numpy.mean(rms * rms)))
+
+        threshold = max(self.min_rms, self.noise_rms * self.speech_ratio)
+        is_speech = rms > threshold
+        for value in rms:
+            self.noise.update(float(value))
+
+        if not is_speech.any():
+            if self.in_speech:
+                self.silence_sec += count * self.frame_sec
+                return self._end_if_silent()
+            return None
+
+        # Silence after the last speech frame of the chunk
+        trailing = count - 1 - int(numpy.flatnonzero(is_speech)[-1])
+        self.silence_sec = trailing * self.frame_sec
+        if not self.in_speech:
+            if is_speech.sum() * self.frame_sec < self.onset_sec:
+                return None
+            self.in_speech = True
+            self.speech_frames = 0
+            self.speech_energy = 0.0
+            self.utterances += 1
+            self._add_speech(rms[is_speech])
+            return SPEECH_STARTED
+        self._add_speech(rms[is_speech])
+        return self._end_if_silent()
+
+    def reset(self):
+        """ Forgets the utterance in progress, keeping the noise floor """
+        self.in_speech = False
+        self.silence_sec = 0.0
+
+    def get_stats(self):
+        return {
+            "noise_dbfs": to_dbfs(self.noise_rms),
+            "current_dbfs": to_dbfs(self.current_rms),
+            "speech_dbfs": to_dbfs(self.speech_rms),
+            "threshold_dbfs": to_dbfs(
+                max(self.min_rms, self.noise_rms * self.speech_ratio)),
+            "in_speech": self.in_speech,
+            "utterances": self.utterances
+        }
+
+    def _add_speech(self, rms):
+        self.speech_frames += len(rms)
+        self.speech_energy += float(numpy.sum(rms * rms))
+        self.speech_rms = math.sqrt(self.speech_energy / self.speech_frames)
+
+    def _end_if_silent(self):
+        if self.silence_sec < self.hangover_sec:
+            return None
+        self.in_speech = False
+        return SPEECH_ENDED